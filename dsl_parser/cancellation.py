@@ -0,0 +1,90 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import contextlib
+import threading
+import time
+
+from dsl_parser import exceptions
+
+
+class CancellationToken(object):
+    """
+    Cancels parsing (and deployment plan preparation) cooperatively.
+
+    Parsing checks the token between elements, before fetching imports and
+    probing urls, and while node instances are expanded, and raises
+    ``exceptions.ParsingCancelledError`` once ``cancel`` was called, or
+    ``exceptions.ParsingTimeoutError`` once ``timeout`` seconds passed
+    since the token was created (or the ``deadline`` time passed).
+    """
+
+    def __init__(self, timeout=None, deadline=None):
+        if timeout is not None:
+            timeout_deadline = time.time() + timeout
+            if deadline is None or timeout_deadline < deadline:
+                deadline = timeout_deadline
+        self.deadline = deadline
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def timed_out(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def check(self):
+        if self._cancelled:
+            raise exceptions.ParsingCancelledError('Parsing was cancelled')
+        if self.timed_out:
+            raise exceptions.ParsingTimeoutError(
+                'Parsing did not complete before its deadline')
+
+
+_current = threading.local()
+
+
+@contextlib.contextmanager
+def active(token):
+    """
+    Make ``token`` the token checked by ``check`` in the current thread,
+    within the block. Without a token, the active token is kept.
+    """
+    previous = getattr(_current, 'token', None)
+    if token is None:
+        yield previous
+        return
+    _current.token = token
+    try:
+        yield token
+    finally:
+        _current.token = previous
+
+
+def current():
+    """The active token of the current thread, if any"""
+    return getattr(_current, 'token', None)
+
+
+def check():
+    """Check the active token of the current thread, if any"""
+    token = getattr(_current, 'token', None)
+    if token is not None:
+        token.check()
@@ -0,0 +1,287 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import cPickle
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+import pkg_resources
+
+from dsl_parser import (functions,
+                        yaml_loader)
+from dsl_parser.framework import stats as _stats
+from dsl_parser.import_resolver.abstract_import_resolver import \
+    AbstractImportResolver
+
+# bumped whenever the layout of cache entries changes
+CACHE_FORMAT_VERSION = 1
+
+_TEMP_PREFIX = '.tmp-'
+
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_sources_digest = None
+
+
+def _parser_version():
+    """
+    The version of the installed parser and the sha1 of its sources, so
+    entries of a changed source checkout are not used either.
+    """
+    global _sources_digest
+    if _sources_digest is None:
+        digest = hashlib.sha1()
+        for directory, dirnames, filenames in os.walk(_PACKAGE_DIR):
+            dirnames[:] = sorted(name for name in dirnames
+                                 if name != 'tests')
+            for filename in sorted(filenames):
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(directory, filename)
+                digest.update(os.path.relpath(path, _PACKAGE_DIR))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        _sources_digest = digest.hexdigest()
+    try:
+        version = pkg_resources.get_distribution(
+            'cloudify-dsl-parser').version
+    except pkg_resources.DistributionNotFound:
+        version = None
+    return version, _sources_digest
+
+
+def _digest(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+class DiskCache(object):
+    """
+    Cache of loaded holder trees and parsed plans kept in ``directory``,
+    shared by processes.
+
+    Entries are keyed by the sha1 of their content and by the parser
+    version, and plans also by their location, resources base url, import
+    resolver rules and the functions registered while parsing. A cached
+    plan is only used if the imports it was parsed with still have the
+    same content. Entries are written atomically, and the least recently
+    used ones are removed once the entries take more than ``max_bytes``.
+    The size of the entries is counted as they are written, so entries
+    written by other processes are only noticed when this count exceeds
+    ``max_bytes``.
+
+    Entries are pickled, so ``directory`` must only be writable by trusted
+    users.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._version = (CACHE_FORMAT_VERSION, _parser_version())
+        # bytes taken by the entries, counted from the first write on
+        self._size = None
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def load(self, raw_yaml, filename, loader=None):
+        """Load ``raw_yaml`` into a holder tree, see ``yaml_loader.load``"""
+        loader = loader or yaml_loader.DefaultLoader
+        key = self._key('holder', _digest(raw_yaml), filename,
+                        loader.__module__, loader.__name__)
+        result = self._read(key)
+        self._count(hit=result is not None)
+        if result is None:
+            result = yaml_loader.load(raw_yaml, filename, loader=loader)
+            self._write(key, result)
+        return result
+
+    def get_plan(self, dsl_string, dsl_location, resources_base_url,
+                 resolver, stats=None):
+        """
+        The plan stored for ``dsl_string``, or None. Imports that can not
+        be fetched any more count as changed. Hits and misses are recorded
+        to ``stats`` when given.
+        """
+        start = time.time()
+        plan = self._get_plan(dsl_string, dsl_location, resources_base_url,
+                              resolver)
+        self._count(hit=plan is not None)
+        if stats is not None:
+            phase = _stats.DISK_CACHE_MISS if plan is None \
+                else _stats.DISK_CACHE_HIT
+            stats.record(phase, DiskCache, time.time() - start)
+        return plan
+
+    def _get_plan(self, dsl_string, dsl_location, resources_base_url,
+                  resolver):
+        key = self._plan_key(dsl_string, dsl_location, resources_base_url,
+                             resolver)
+        entry = self._read(key)
+        if entry is None:
+            return None
+        imports, plan = entry
+        for import_url, digest in imports:
+            try:
+                content = resolver.fetch_import(import_url)
+            except Exception:
+                return None
+            if _digest(content) != digest:
+                return None
+        return plan
+
+    def put_plan(self, dsl_string, dsl_location, resources_base_url,
+                 resolver, plan, imports):
+        """
+        Store ``plan``, parsed from ``dsl_string`` with the ``imports`` of
+        a ``RecordingResolver``.
+        """
+        key = self._plan_key(dsl_string, dsl_location, resources_base_url,
+                             resolver)
+        self._write(key, (imports, plan))
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                _remove(os.path.join(self.directory, name))
+            self._size = None
+            self.hits = 0
+            self.misses = 0
+
+    def _plan_key(self, dsl_string, dsl_location, resources_base_url,
+                  resolver):
+        rules = getattr(resolver, 'rules', None)
+        # plans are validated against the functions they are parsed with
+        registry = sorted((name, fn.__module__, fn.__name__)
+                          for name, fn in
+                          functions.current_registry().iteritems())
+        return self._key('plan', _digest(dsl_string), dsl_location,
+                         resources_base_url,
+                         type(resolver).__module__, type(resolver).__name__,
+                         rules, registry)
+
+    def _key(self, *parts):
+        return _digest(repr(self._version + parts))
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _read(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return None
+        try:
+            result = cPickle.loads(zlib.decompress(data))
+        except Exception:
+            # corrupted entry
+            _remove(path)
+            return None
+        try:
+            # entries are evicted in least recently used order
+            os.utime(path, None)
+        except OSError:
+            pass
+        return result
+
+    def _write(self, key, value):
+        data = zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+        path = os.path.join(self.directory, key)
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             prefix=_TEMP_PREFIX)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.rename(temp_path, path)
+            except (IOError, OSError):
+                _remove(temp_path)
+                raise
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(size for _, size, _ in self._entries())
+                else:
+                    self._size += len(data)
+                evict = self._size > self.max_bytes
+            if evict:
+                self._evict()
+        except (IOError, OSError):
+            # the cache is best effort, parsing does not fail when it can
+            # not be written
+            pass
+
+    def _entries(self):
+        """(modification time, size, path) of the entries"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith(_TEMP_PREFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            _remove(path)
+            total -= size
+        with self._lock:
+            self._size = total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class RecordingResolver(AbstractImportResolver):
+    """
+    Import resolver recording the url and content digest of every import
+    fetched through it, for ``DiskCache.put_plan``.
+    """
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.imports = []
+
+    def resolve(self, import_url):
+        return self.resolver.resolve(import_url)
+
+    def fetch_import(self, import_url):
+        result = self.resolver.fetch_import(import_url)
+        self.imports.append((import_url, _digest(result)))
+        return result
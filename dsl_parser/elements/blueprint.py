@@ -24,7 +24,8 @@ from dsl_parser.elements import (imports,
                                  workflows,
                                  policies)
 from dsl_parser.framework.elements import Element
-from dsl_parser.framework.requirements import Value
+from dsl_parser.framework.requirements import (Requirement,
+                                               Value)
 
 
 class BlueprintVersionExtractor(Element):
@@ -79,26 +80,38 @@ class Blueprint(Element):
         'workflows': workflows.Workflows,
         'outputs': misc.Outputs,
     }
+    # not required as sections are missing when the blueprint is parsed
+    # partially (see the sections argument of parser.parse)
     requires = {
-        node_templates.NodeTemplates: ['deployment_plugins_to_install'],
-        workflows.Workflows: ['workflow_plugins_to_install']
+        node_templates.NodeTemplates: [
+            Requirement('deployment_plugins_to_install', required=False)],
+        workflows.Workflows: [
+            Requirement('workflow_plugins_to_install', required=False)]
     }
 
+    plan_sections = [
+        (constants.NODES, node_templates.NodeTemplates),
+        (constants.RELATIONSHIPS, relationships.Relationships),
+        (constants.WORKFLOWS, workflows.Workflows),
+        (constants.POLICY_TYPES, policies.PolicyTypes),
+        (constants.POLICY_TRIGGERS, policies.PolicyTriggers),
+        (constants.GROUPS, policies.Groups),
+        (constants.INPUTS, misc.Inputs),
+        (constants.OUTPUTS, misc.Outputs),
+        (constants.VERSION, misc.ToscaDefinitionsVersion)
+    ]
+
     def parse(self, workflow_plugins_to_install,
               deployment_plugins_to_install):
-        return models.Plan({
-            constants.NODES: self.child(node_templates.NodeTemplates).value,
-            constants.RELATIONSHIPS: self.child(
-                relationships.Relationships).value,
-            constants.WORKFLOWS: self.child(workflows.Workflows).value,
-            constants.POLICY_TYPES: self.child(policies.PolicyTypes).value,
-            constants.POLICY_TRIGGERS:
-                self.child(policies.PolicyTriggers).value,
-            constants.GROUPS: self.child(policies.Groups).value,
-            constants.INPUTS: self.child(misc.Inputs).value,
-            constants.OUTPUTS: self.child(misc.Outputs).value,
-            constants.DEPLOYMENT_PLUGINS_TO_INSTALL:
-                deployment_plugins_to_install,
-            constants.WORKFLOW_PLUGINS_TO_INSTALL: workflow_plugins_to_install,
-            constants.VERSION: self.child(misc.ToscaDefinitionsVersion).value
-        })
+        children = dict((type(child), child) for child in self.children())
+        plan = {}
+        for plan_key, element_type in self.plan_sections:
+            if element_type in children:
+                plan[plan_key] = children[element_type].value
+        if node_templates.NodeTemplates in children:
+            plan[constants.DEPLOYMENT_PLUGINS_TO_INSTALL] = \
+                deployment_plugins_to_install
+        if workflows.Workflows in children:
+            plan[constants.WORKFLOW_PLUGINS_TO_INSTALL] = \
+                workflow_plugins_to_install
+        return models.Plan(plan)
@@ -18,8 +18,10 @@ import urllib
 
 import networkx as nx
 
-from dsl_parser import (exceptions,
+from dsl_parser import (cancellation,
+                        exceptions,
                         constants,
+                        holder,
                         version as _version,
                         utils)
 from dsl_parser.framework.elements import (Element,
@@ -67,7 +69,8 @@ class ImportsLoader(Element):
                    'resources_base_url',
                    'blueprint_location',
                    'version',
-                   'resolver']
+                   'resolver',
+                   'yaml_cache']
     }
 
     resource_base = None
@@ -86,7 +89,8 @@ class ImportsLoader(Element):
               resources_base_url,
               blueprint_location,
               version,
-              resolver):
+              resolver,
+              yaml_cache):
         if blueprint_location:
             blueprint_location = _dsl_location_to_url(
                 dsl_location=blueprint_location,
@@ -97,7 +101,8 @@ class ImportsLoader(Element):
                                 dsl_location=blueprint_location,
                                 resources_base_url=resources_base_url,
                                 version=version,
-                                resolver=resolver)
+                                resolver=resolver,
+                                yaml_cache=yaml_cache)
 
     def calculate_provided(self, **kwargs):
         return {
@@ -144,20 +149,26 @@ def _get_resource_location(resource_name,
 
 
 def _combine_imports(parsed_dsl_holder, dsl_location,
-                     resources_base_url, version, resolver):
+                     resources_base_url, version, resolver,
+                     yaml_cache=None):
     ordered_imports = _build_ordered_imports(parsed_dsl_holder,
                                              dsl_location,
                                              resources_base_url,
-                                             resolver)
+                                             resolver,
+                                             yaml_cache)
     holder_result = parsed_dsl_holder.copy()
     version_key_holder, version_value_holder = parsed_dsl_holder.get_item(
         _version.VERSION)
-    holder_result.value = {}
+    holder_result.value = holder.HolderDict()
+    # loaded holders may be shared by other parses (yaml cache), so dicts
+    # merged into are copied first
+    copied = set()
     for imported in ordered_imports:
         import_url = imported['import']
         parsed_imported_dsl_holder = imported['parsed']
         _validate_version(version.raw, import_url, parsed_imported_dsl_holder)
-        _merge_parsed_into_combined(holder_result, parsed_imported_dsl_holder)
+        _merge_parsed_into_combined(holder_result, parsed_imported_dsl_holder,
+                                    copied)
     holder_result.value[version_key_holder] = version_value_holder
     return holder_result
 
@@ -165,7 +176,8 @@ def _combine_imports(parsed_dsl_holder, dsl_location,
 def _build_ordered_imports(parsed_dsl_holder,
                            dsl_location,
                            resources_base_url,
-                           resolver):
+                           resolver,
+                           yaml_cache=None):
 
     def location(value):
         return value or 'root'
@@ -194,12 +206,14 @@ def _build_ordered_imports(parsed_dsl_holder,
                 imports_graph.add_graph_dependency(import_url,
                                                    location(_current_import))
             else:
+                cancellation.check()
                 raw_imported_dsl = resolver.fetch_import(import_url)
                 imported_dsl_holder = utils.load_yaml(
                     raw_yaml=raw_imported_dsl,
                     error_message="Failed to parse import '{0}' (via '{1}')"
                                   .format(another_import, import_url),
-                    filename=another_import)
+                    filename=another_import,
+                    cache=yaml_cache)
                 imports_graph.add(import_url, imported_dsl_holder,
                                   location(_current_import))
                 _build_ordered_imports_recursive(imported_dsl_holder,
@@ -226,7 +240,8 @@ def _validate_version(dsl_version,
 
 
 def _merge_parsed_into_combined(combined_parsed_dsl_holder,
-                                parsed_imported_dsl_holder):
+                                parsed_imported_dsl_holder,
+                                copied):
     for key_holder, value_holder in parsed_imported_dsl_holder.value.\
             iteritems():
         if key_holder.value in IGNORE:
@@ -234,7 +249,12 @@ def _merge_parsed_into_combined(combined_parsed_dsl_holder,
         elif key_holder.value not in combined_parsed_dsl_holder:
             combined_parsed_dsl_holder.value[key_holder] = value_holder
         elif key_holder.value in MERGE_NO_OVERRIDE:
-            _, to_dict = combined_parsed_dsl_holder.get_item(key_holder.value)
+            to_key, to_dict = combined_parsed_dsl_holder.get_item(
+                key_holder.value)
+            if to_dict not in copied:
+                to_dict = _copy_dict_holder(to_dict)
+                combined_parsed_dsl_holder.value[to_key] = to_dict
+                copied.add(to_dict)
             _merge_into_dict_or_throw_on_duplicate(
                 from_dict_holder=value_holder,
                 to_dict_holder=to_dict,
@@ -245,6 +265,13 @@ def _merge_parsed_into_combined(combined_parsed_dsl_holder,
                    .format(key_holder.value))
 
 
+def _copy_dict_holder(dict_holder):
+    result = dict_holder.copy()
+    if isinstance(result.value, dict):
+        result.value = holder.HolderDict(result.value)
+    return result
+
+
 def _merge_into_dict_or_throw_on_duplicate(from_dict_holder, to_dict_holder,
                                            key_name):
     for key_holder, value_holder in from_dict_holder.value.iteritems():
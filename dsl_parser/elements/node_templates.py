@@ -165,12 +165,11 @@ class NodeTemplateInstances(DictElement):
             return self.initial_value
 
 
-def _node_template_relationship_type_predicate(source, target):
+def _node_template_relationship_type_keys(source):
     try:
-        return (source.child(NodeTemplateRelationshipType).initial_value ==
-                target.name)
+        return [source.child(NodeTemplateRelationshipType).initial_value]
     except exceptions.DSLParsingElementMatchException:
-        return False
+        return []
 
 
 class NodeTemplateRelationship(Element):
@@ -185,7 +184,7 @@ class NodeTemplateRelationship(Element):
     requires = {
         _relationships.Relationship: [
             Value('relationship_type',
-                  predicate=_node_template_relationship_type_predicate)]
+                  source_keys=_node_template_relationship_type_keys)]
     }
 
     def parse(self, relationship_type):
@@ -215,11 +214,10 @@ class NodeTemplateRelationships(Element):
         contained_in_relationships = []
         contained_in_targets = []
         for relationship in self.children():
-            relationship_target = relationship.child(
-                NodeTemplateRelationshipTarget).value
-            relationship_type = relationship.child(
-                NodeTemplateRelationshipType).value
-            type_hierarchy = relationship.value[constants.TYPE_HIERARCHY]
+            relationship_value = relationship.value
+            relationship_target = relationship_value['target_id']
+            relationship_type = relationship_value['type']
+            type_hierarchy = relationship_value[constants.TYPE_HIERARCHY]
             if constants.CONTAINED_IN_REL_TYPE in type_hierarchy:
                 contained_in_relationships.append(relationship_type)
                 contained_in_targets.append(relationship_target)
@@ -241,7 +239,7 @@ class NodeTemplateRelationships(Element):
                                         key=lambda child: child.index)]
 
     def calculate_provided(self):
-        contained_in_list = [r.child(NodeTemplateRelationshipTarget).value
+        contained_in_list = [r.value['target_id']
                              for r in self.children()
                              if constants.CONTAINED_IN_REL_TYPE in
                              r.value[constants.TYPE_HIERARCHY]]
@@ -251,20 +249,17 @@ class NodeTemplateRelationships(Element):
         }
 
 
-def _node_template_related_nodes_predicate(source, target):
-    if source.name == target.name:
-        return False
+def _node_template_related_nodes_keys(source):
     targets = source.descendants(NodeTemplateRelationshipTarget)
-    relationship_targets = [e.initial_value for e in targets]
-    return target.name in relationship_targets
+    return [e.initial_value for e in targets
+            if e.initial_value != source.name]
 
 
-def _node_template_node_type_predicate(source, target):
+def _node_template_node_type_keys(source):
     try:
-        return (source.child(NodeTemplateType).initial_value ==
-                target.name)
+        return [source.child(NodeTemplateType).initial_value]
     except exceptions.DSLParsingElementMatchException:
-        return False
+        return []
 
 
 class NodeTemplate(Element):
@@ -279,12 +274,12 @@ class NodeTemplate(Element):
     requires = {
         'inputs': [Requirement('resource_base', required=False)],
         'self': [Value('related_node_templates',
-                       predicate=_node_template_related_nodes_predicate,
+                       source_keys=_node_template_related_nodes_keys,
                        multiple_results=True)],
         _plugins.Plugins: [Value('plugins')],
         _node_types.NodeType: [
             Value('node_type',
-                  predicate=_node_template_node_type_predicate)],
+                  source_keys=_node_template_node_type_keys)],
         _node_types.NodeTypes: ['host_types']
     }
 
@@ -314,6 +309,10 @@ class NodeTemplate(Element):
             error_code=10,
             resource_base=resource_base)
 
+        # relationships are updated in place below
+        node[constants.RELATIONSHIPS] = [
+            dict(relationship)
+            for relationship in node[constants.RELATIONSHIPS]]
         node_name_to_node = dict((node['id'], node)
                                  for node in related_node_templates)
         _post_process_node_relationships(processed_node=node,
@@ -423,7 +422,7 @@ class NodeTemplates(Element):
     ]
 
     def parse(self, host_types, plugins):
-        processed_nodes = dict((node.name, node.value)
+        processed_nodes = dict((node.name, dict(node.value))
                                for node in self.children())
         _process_nodes_plugins(
             processed_nodes=processed_nodes,
@@ -26,6 +26,8 @@ from dsl_parser.framework.elements import Dict
 
 class NodeType(types.Type):
 
+    cacheable = True
+
     schema = {
         'derived_from': types.TypeDerivedFrom,
         'interfaces': operation.NodeTypeInterfaces,
@@ -33,7 +35,7 @@ class NodeType(types.Type):
     }
     requires = {
         'self': [requirements.Value('super_type',
-                                    predicate=types.derived_from_predicate,
+                                    source_keys=types.derived_from_keys,
                                     required=False)]
     }
 
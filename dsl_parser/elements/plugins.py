@@ -81,6 +81,8 @@ class PluginInstallArguments(Element):
 
 class Plugin(DictElement):
 
+    cacheable = True
+
     schema = {
         'source': PluginSource,
         'executor': PluginExecutor,
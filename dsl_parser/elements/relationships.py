@@ -26,6 +26,8 @@ from dsl_parser.framework.elements import Dict
 
 class Relationship(types.Type):
 
+    cacheable = True
+
     schema = {
         'derived_from': types.RelationshipDerivedFrom,
         'properties': properties.Schema,
@@ -36,7 +38,7 @@ class Relationship(types.Type):
         'inputs': [Requirement('resource_base', required=False)],
         _plugins.Plugins: [Value('plugins')],
         'self': [Value('super_type',
-                       predicate=types.derived_from_predicate,
+                       source_keys=types.derived_from_keys,
                        required=False)]
     }
 
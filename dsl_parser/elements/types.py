@@ -63,9 +63,9 @@ class TypeDerivedFrom(DerivedFrom):
     descriptor = 'type'
 
 
-def derived_from_predicate(source, target):
+def derived_from_keys(source):
     try:
         derived_from = source.child(DerivedFrom).initial_value
-        return derived_from and derived_from == target.name
     except exceptions.DSLParsingElementMatchException:
-        return False
+        return []
+    return [derived_from] if derived_from else []
@@ -42,6 +42,24 @@ class FunctionEvaluationError(Exception):
         super(FunctionEvaluationError, self).__init__(msg)
 
 
+class ParsingCancelledError(Exception):
+    """
+    An error raised when parsing is cancelled through a cancellation token.
+    ``stats`` holds the parse stats recorded until then, if any.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ParsingCancelledError, self).__init__(*args, **kwargs)
+        self.stats = None
+
+
+class ParsingTimeoutError(ParsingCancelledError):
+    """
+    An error raised when parsing does not complete before the deadline of
+    its cancellation token.
+    """
+    pass
+
+
 class DSLParsingException(Exception):
     def __init__(self, err_code, *args):
         super(DSLParsingException, self).__init__(*args)
@@ -78,6 +96,25 @@ class DSLParsingSchemaAPIException(DSLParsingException):
     pass
 
 
+class DSLParsingErrorsException(DSLParsingException):
+    """
+    An error raised when parsing collects more than one error. The
+    collected errors, in the order they were raised, are in ``errors``.
+    """
+    def __init__(self, errors):
+        super(DSLParsingErrorsException, self).__init__(
+            ERROR_CODE_MULTIPLE_ERRORS,
+            'Parsing failed with {0} errors'.format(len(errors)))
+        self.errors = errors
+
+    def __str__(self):
+        message = super(DSLParsingErrorsException, self).__str__()
+        return '{0}:\n{1}'.format(message, '\n'.join(
+            '{0}. {1}'.format(index, error)
+            for index, error in enumerate(self.errors, start=1)))
+
+
 ERROR_CODE_CYCLE = 100
 ERROR_CODE_ILLEGAL_VALUE_ACCESS = 101
 ERROR_CODE_DSL_DEFINITIONS_VERSION_MISMATCH = 102
+ERROR_CODE_MULTIPLE_ERRORS = 103
@@ -13,11 +13,12 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-import copy
 from StringIO import StringIO
 
 from dsl_parser import exceptions
 from dsl_parser import holder
+from dsl_parser.framework import frozen
+from dsl_parser.framework.requirements import Requirement
 
 
 class Unparsed(object):
@@ -25,6 +26,16 @@ class Unparsed(object):
 UNPARSED = Unparsed()
 
 
+class Unrestored(object):
+    pass
+UNRESTORED = Unrestored()
+
+
+class Released(object):
+    pass
+RELEASED = Released()
+
+
 class ElementType(object):
 
     def __init__(self, type):
@@ -45,18 +56,44 @@ class List(ElementType):
     pass
 
 
+class ElementMeta(type):
+    """
+    Replaces requirement names in the ``requires`` of element classes
+    with ``Requirement`` instances when the classes are defined.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(ElementMeta, cls).__init__(name, bases, attrs)
+        if 'requires' in attrs:
+            cls.requires = dict(
+                (required_type,
+                 [Requirement(r) if isinstance(r, basestring) else r
+                  for r in requirements])
+                for required_type, requirements in attrs['requires'].items())
+
+
 class Element(object):
 
+    __metaclass__ = ElementMeta
+
     schema = None
     required = False
     requires = {}
     provides = []
+    # results of cacheable elements may be taken from an element cache
+    # (see parser.parse). Their validation and results must only depend on
+    # their path, initial value, child values and requirement values.
+    cacheable = False
 
     def __init__(self, context, initial_value, name=None):
         self.context = context
+        self._id = None
+        self._parent_element = None
+        self._path = None
+        self._ancestors_by_type = None
         initial_value = holder.Holder.of(initial_value)
         self.initial_value_holder = initial_value
-        self._initial_value = initial_value.restore()
+        self._initial_value = UNRESTORED
         self.start_line = initial_value.start_line
         self.start_column = initial_value.start_column
         self.end_line = initial_value.end_line
@@ -83,7 +120,7 @@ class Element(object):
             message.write('\n  in line {0}, column {1}'
                           .format(self.start_line + 1, self.start_column))
         message.write('\n  path: {0}'.format(self.path))
-        message.write('\n  value: {0}'.format(self._initial_value))
+        message.write('\n  value: {0}'.format(self.initial_value))
 
         return message.getvalue()
 
@@ -98,48 +135,92 @@ class Element(object):
         """Alias name for list based elements"""
         return self.name
 
+    # initial_value, value and provided are frozen (see framework.frozen)
+    # and shared with every element that reads them. Elements that need to
+    # modify such a value should work on a copy of it.
+
     @property
     def initial_value(self):
-        return copy.deepcopy(self._initial_value)
+        if self.context.track_reads:
+            self.context.record_read(self, 'initial_value')
+        # restored on first access, sharing the restored values of nested
+        # holders with the rest of the elements in the context
+        if self._initial_value is UNRESTORED:
+            self._initial_value = self.context.restore(
+                self.initial_value_holder)
+        elif self._initial_value is RELEASED:
+            raise _released_value_access()
+        return self._initial_value
 
     @property
     def value(self):
-        if self._parsed_value == UNPARSED:
+        if self.context.track_reads:
+            self.context.record_read(self, 'value')
+        if self._parsed_value is UNPARSED:
             raise exceptions.DSLParsingSchemaAPIException(
                 exceptions.ERROR_CODE_ILLEGAL_VALUE_ACCESS,
                 'Cannot access element value before parsing')
-        return copy.deepcopy(self._parsed_value)
+        if self._parsed_value is RELEASED:
+            raise _released_value_access()
+        return self._parsed_value
 
     @value.setter
     def value(self, val):
-        self._parsed_value = val
+        self._parsed_value = frozen.freeze(val)
 
     def calculate_provided(self, **kwargs):
         return {}
 
     @property
     def provided(self):
-        return copy.deepcopy(self._provided)
+        if self.context.track_reads:
+            self.context.record_read(self, 'provided')
+        if self._provided is RELEASED:
+            raise _released_value_access()
+        return self._provided
 
     @provided.setter
     def provided(self, value):
-        self._provided = value
+        self._provided = frozen.freeze(value)
 
     @property
     def path(self):
-        elements = [str(e.name) for e in self.context.ancestors_iter(self)]
-        if elements:
-            elements.pop()
-        elements.reverse()
-        elements.append(str(self.name))
-        return '.'.join(elements)
+        if self._path is None:
+            parent = self._parent_element
+            if parent is None:
+                self._path = str(self.name)
+            elif parent._parent_element is None:
+                # the root element name is not part of paths
+                self._path = str(self.name)
+            else:
+                self._path = '{0}.{1}'.format(parent.path, self.name)
+        return self._path
+
+    def _release(self):
+        # called by the parser once no other element needs the values of
+        # this element, so they can be garbage collected during parsing
+        self.initial_value_holder = None
+        self._initial_value = RELEASED
+        self._parsed_value = RELEASED
+        self._provided = RELEASED
+        self._ancestors_by_type = None
 
     def _parent(self):
-        return next(self.context.ancestors_iter(self))
+        return self._parent_element
+
+    def _ancestors(self):
+        parent = self._parent_element
+        while parent is not None:
+            yield parent
+            parent = parent._parent_element
 
     def ancestor(self, element_type):
-        matches = [e for e in self.context.ancestors_iter(self)
-                   if isinstance(e, element_type)]
+        if self._ancestors_by_type is None:
+            self._ancestors_by_type = {}
+        matches = self._ancestors_by_type.get(element_type)
+        if matches is None:
+            matches = self._ancestors_by_type[element_type] = [
+                e for e in self._ancestors() if isinstance(e, element_type)]
         if not matches:
             raise exceptions.DSLParsingElementMatchException(
                 "No matches found for '{0}'".format(element_type))
@@ -153,8 +234,7 @@ class Element(object):
                 if isinstance(e, element_type)]
 
     def child(self, element_type):
-        matches = [e for e in self.context.child_elements_iter(self)
-                   if isinstance(e, element_type)]
+        matches = self.context.child_elements_of_type(self, element_type)
         if not matches:
             raise exceptions.DSLParsingElementMatchException(
                 "No matches found for '{0}'".format(element_type))
@@ -174,6 +254,12 @@ class Element(object):
         return self._parent().child(element_type)
 
 
+def _released_value_access():
+    return exceptions.DSLParsingSchemaAPIException(
+        exceptions.ERROR_CODE_ILLEGAL_VALUE_ACCESS,
+        'Cannot access element value after it was released')
+
+
 class DictElement(Element):
 
     def parse(self, **kwargs):
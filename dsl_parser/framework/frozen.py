@@ -0,0 +1,191 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import copy
+import hashlib
+
+from dsl_parser import holder
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("'{0}' object is read only"
+                    .format(type(self).__name__))
+
+
+class FrozenDict(dict):
+    """
+    Read only dict used for element values so they can be shared between
+    all dependent elements without copying them. ``copy.deepcopy`` returns
+    a plain, mutable dict (see ``thaw``).
+    """
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """
+    Read only list used for element values. ``copy.deepcopy`` returns a
+    plain, mutable list (see ``thaw``).
+    """
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _read_only
+    __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value, memo=None):
+    """
+    Return a read only version of ``value``. Plain dicts, lists and sets
+    are converted recursively, values that are already frozen are returned
+    as is and objects shared within ``value`` stay shared.
+    """
+    value_type = type(value)
+    if value_type not in (dict, list, set):
+        return value
+    if memo is None:
+        memo = {}
+    value_id = id(value)
+    if value_id in memo:
+        return memo[value_id]
+    if value_type is dict:
+        result = FrozenDict((key, freeze(item, memo))
+                            for key, item in value.iteritems())
+    elif value_type is list:
+        result = FrozenList(freeze(item, memo) for item in value)
+    else:
+        result = frozenset(value)
+    memo[value_id] = result
+    return result
+
+
+def thaw(value):
+    """
+    Return a mutable copy of ``value``. Unlike ``copy.deepcopy``, values
+    that are shared within ``value`` are copied separately, so changing one
+    part of the result never changes another. Holders are returned as is,
+    they are handed between parser passes and are not element values.
+    """
+    if isinstance(value, holder.Holder):
+        return value
+    value_type = type(value)
+    if value_type in (FrozenDict, dict):
+        return dict((key, thaw(item)) for key, item in value.iteritems())
+    elif value_type in (FrozenList, list):
+        return [thaw(item) for item in value]
+    elif value_type in (frozenset, set):
+        return set(value)
+    return copy.deepcopy(value)
+
+
+def forget(value_holder, memo):
+    """
+    Remove ``value_holder`` and its nested holders from a ``restore``
+    memo.
+    """
+    pending = [value_holder]
+    while pending:
+        value_holder = pending.pop()
+        if memo.pop(id(value_holder), None) is None:
+            continue
+        value = value_holder.value
+        if isinstance(value, dict):
+            for key_holder, item_holder in value.iteritems():
+                pending.append(key_holder)
+                pending.append(item_holder)
+        elif isinstance(value, (list, set)):
+            pending.extend(value)
+
+
+def restore(value_holder, memo):
+    """
+    Restore ``value_holder`` directly into frozen values. Every holder is
+    restored once per ``memo``: restoring a holder whose sub-holders were
+    already restored reuses their results and vice versa. A holder whose
+    value was replaced or had items added since it was restored (as import
+    merging does) is restored again.
+    """
+    holder_id = id(value_holder)
+    value = value_holder.value
+    restored = memo.get(holder_id)
+    if restored is not None:
+        _, restored_value, restored_size, result = restored
+        if restored_value is value and restored_size == _size(value):
+            return result
+    if isinstance(value, dict):
+        result = FrozenDict((restore(key_holder, memo),
+                             restore(item_holder, memo))
+                            for key_holder, item_holder in value.iteritems())
+    elif isinstance(value, list):
+        result = FrozenList(restore(item_holder, memo)
+                            for item_holder in value)
+    elif isinstance(value, set):
+        result = frozenset(restore(item_holder, memo)
+                           for item_holder in value)
+    else:
+        result = value
+    # the holder is kept so its id is not reused while memo is alive
+    memo[holder_id] = (value_holder, value, _size(value), result)
+    return result
+
+
+def _size(value):
+    if isinstance(value, (dict, list, set)):
+        return len(value)
+    return None
+
+
+def digest(value, memo):
+    """
+    Content digest of ``value``. Values with equal digests are equal and
+    made of the same types. Digests of containers are kept in ``memo``.
+    """
+    if not isinstance(value, (dict, list, tuple, set, frozenset)):
+        return hashlib.sha1('{0}:{1!r}'.format(type(value).__name__,
+                                               value)).digest()
+    value_id = id(value)
+    digested = memo.get(value_id)
+    if digested is not None:
+        return digested[1]
+    if isinstance(value, dict):
+        parts = sorted(digest(key, memo) + digest(item, memo)
+                       for key, item in value.iteritems())
+    elif isinstance(value, (list, tuple)):
+        parts = [digest(item, memo) for item in value]
+    else:
+        parts = sorted(digest(item, memo) for item in value)
+    result = hashlib.sha1('{0}:{1}'.format(type(value).__name__,
+                                           ''.join(parts))).digest()
+    # the value is kept so its id is not reused while memo is alive
+    memo[value_id] = (value, result)
+    return result
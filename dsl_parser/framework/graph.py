@@ -0,0 +1,251 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from array import array
+from collections import deque
+
+NO_PARENT = -1
+
+
+def _zeros(size):
+    return array('l', [0]) * size
+
+
+class ElementTree(object):
+    """
+    Element tree stored in flat arrays indexed by integer element ids.
+
+    Ids are assigned in pre-order, so the descendants of an element are
+    the contiguous range of ids that follows it. Children are kept in
+    a single array, sliced by per element offsets, once ``build`` is
+    called after all elements have been added.
+    """
+
+    def __init__(self):
+        self._parents = array('l')
+        self._subtree_ends = array('l')
+        self._child_offsets = None
+        self._child_ids = None
+
+    def __len__(self):
+        return len(self._parents)
+
+    def add(self, parent_id=NO_PARENT):
+        element_id = len(self._parents)
+        self._parents.append(parent_id)
+        self._subtree_ends.append(element_id + 1)
+        return element_id
+
+    def close(self, element_id):
+        self._subtree_ends[element_id] = len(self._parents)
+
+    def build(self):
+        size = len(self._parents)
+        offsets = _zeros(size + 1)
+        for parent_id in self._parents:
+            if parent_id != NO_PARENT:
+                offsets[parent_id + 1] += 1
+        for element_id in xrange(size):
+            offsets[element_id + 1] += offsets[element_id]
+        child_ids = _zeros(offsets[size])
+        next_slot = array('l', offsets)
+        for element_id, parent_id in enumerate(self._parents):
+            if parent_id != NO_PARENT:
+                child_ids[next_slot[parent_id]] = element_id
+                next_slot[parent_id] += 1
+        self._child_offsets = offsets
+        self._child_ids = child_ids
+
+    def parent(self, element_id):
+        return self._parents[element_id]
+
+    def children(self, element_id):
+        return self._child_ids[self._child_offsets[element_id]:
+                               self._child_offsets[element_id + 1]]
+
+    def descendants(self, element_id):
+        return xrange(element_id + 1, self._subtree_ends[element_id])
+
+    def ancestors(self, element_id):
+        parent_id = self._parents[element_id]
+        while parent_id != NO_PARENT:
+            yield parent_id
+            parent_id = self._parents[parent_id]
+
+
+class DependencyGraph(object):
+    """
+    Directed graph over integer ids in which an edge points from a
+    dependency to the node that depends on it.
+    """
+
+    def __init__(self, size):
+        self._dependents = [None] * size
+        self._in_degrees = _zeros(size)
+
+    def __len__(self):
+        return len(self._dependents)
+
+    def add_node(self):
+        self._dependents.append(None)
+        self._in_degrees.append(0)
+        return len(self._dependents) - 1
+
+    def add_edge(self, dependency_id, dependent_id):
+        dependents = self._dependents[dependency_id]
+        if dependents is None:
+            dependents = self._dependents[dependency_id] = []
+        dependents.append(dependent_id)
+        self._in_degrees[dependent_id] += 1
+
+    def dependents(self, node_id):
+        return self._dependents[node_id] or ()
+
+    def edges(self):
+        for dependency_id, dependents in enumerate(self._dependents):
+            for dependent_id in dependents or ():
+                yield dependency_id, dependent_id
+
+    def topological_sort(self):
+        """
+        Kahn's algorithm. Nodes that are ready at the same time are
+        returned in the order they became ready, starting from id order, so
+        the result is deterministic. Nodes that are part of, or depend on,
+        a cycle are missing from the result.
+        """
+        in_degrees = array('l', self._in_degrees)
+        ready = deque(node_id for node_id, in_degree in enumerate(in_degrees)
+                      if in_degree == 0)
+        result = []
+        while ready:
+            node_id = ready.popleft()
+            result.append(node_id)
+            for dependent_id in self.dependents(node_id):
+                in_degrees[dependent_id] -= 1
+                if in_degrees[dependent_id] == 0:
+                    ready.append(dependent_id)
+        return result
+
+    def topological_levels(self):
+        """
+        Nodes grouped by the length of the longest path that leads to them.
+        Nodes of a level only depend on nodes of previous levels and
+        concatenating the levels gives the ``topological_sort`` result.
+        """
+        in_degrees = array('l', self._in_degrees)
+        level = [node_id for node_id, in_degree in enumerate(in_degrees)
+                 if in_degree == 0]
+        levels = []
+        while level:
+            levels.append(level)
+            next_level = []
+            for node_id in level:
+                for dependent_id in self.dependents(node_id):
+                    in_degrees[dependent_id] -= 1
+                    if in_degrees[dependent_id] == 0:
+                        next_level.append(dependent_id)
+            level = next_level
+        return levels
+
+    def find_cycle(self, node_ids=None):
+        """
+        A shortest cycle through the lowest node id of the first strongly
+        connected component that has a cycle, as a list of node ids in
+        edge order, or None if there is no cycle. Only nodes in
+        ``node_ids`` are considered, when given. Runs in linear time.
+        """
+        if node_ids is None:
+            node_ids = xrange(len(self))
+        members = set(node_ids)
+        cyclic_components = [
+            component for component in
+            self._strongly_connected_components(sorted(members), members)
+            if len(component) > 1 or component[0] in self.dependents(
+                component[0])]
+        if not cyclic_components:
+            return None
+        start_id = min(min(component) for component in cyclic_components)
+        component = next(set(component) for component in cyclic_components
+                         if start_id in component)
+        return self._shortest_cycle(start_id, component)
+
+    def _strongly_connected_components(self, node_ids, members):
+        # Tarjan's algorithm, iterative so deep graphs do not exceed the
+        # recursion limit
+        indexes = {}
+        low_links = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root_id in node_ids:
+            if root_id in indexes:
+                continue
+            indexes[root_id] = low_links[root_id] = len(indexes)
+            stack.append(root_id)
+            on_stack.add(root_id)
+            work = [(root_id, iter(self.dependents(root_id)))]
+            while work:
+                node_id, dependents = work[-1]
+                for dependent_id in dependents:
+                    if dependent_id not in members:
+                        continue
+                    if dependent_id not in indexes:
+                        indexes[dependent_id] = low_links[dependent_id] = \
+                            len(indexes)
+                        stack.append(dependent_id)
+                        on_stack.add(dependent_id)
+                        work.append((dependent_id,
+                                     iter(self.dependents(dependent_id))))
+                        break
+                    if dependent_id in on_stack:
+                        low_links[node_id] = min(low_links[node_id],
+                                                 indexes[dependent_id])
+                else:
+                    work.pop()
+                    if work:
+                        parent_id = work[-1][0]
+                        low_links[parent_id] = min(low_links[parent_id],
+                                                   low_links[node_id])
+                    if low_links[node_id] == indexes[node_id]:
+                        component = []
+                        while True:
+                            member_id = stack.pop()
+                            on_stack.discard(member_id)
+                            component.append(member_id)
+                            if member_id == node_id:
+                                break
+                        components.append(component)
+        return components
+
+    def _shortest_cycle(self, start_id, component):
+        # breadth first search from the start node back to itself
+        previous = {start_id: None}
+        queue = deque([start_id])
+        while queue:
+            node_id = queue.popleft()
+            for dependent_id in self.dependents(node_id):
+                if dependent_id == start_id:
+                    cycle = []
+                    while node_id is not None:
+                        cycle.append(node_id)
+                        node_id = previous[node_id]
+                    cycle.reverse()
+                    return cycle
+                if dependent_id in component and \
+                        dependent_id not in previous:
+                    previous[dependent_id] = node_id
+                    queue.append(dependent_id)
+        raise ValueError('Illegal state: node {0} is not part of a cycle'
+                         .format(start_id))
@@ -14,19 +14,46 @@
 #    * limitations under the License.
 
 
+def element_name_key(element):
+    return element.name
+
+
 class Requirement(object):
+    """
+    A requirement an element has on elements of another type.
+
+    By default, every element of the required type satisfies the
+    requirement. ``predicate(source, target)`` restricts the matching
+    elements. ``source_keys(source)`` and ``target_key(target)`` do the same
+    through keys: a required element matches when its key is one of the
+    keys returned for the requiring element. Keyed requirements are
+    resolved through a hash index instead of calling a predicate for every
+    (source, target) pair, so they should be preferred whenever a
+    requirement can be expressed that way. ``target_key`` defaults to the
+    required element name.
+    """
 
     def __init__(self,
                  name,
                  parsed=False,
                  multiple_results=False,
                  required=True,
-                 predicate=None):
+                 predicate=None,
+                 source_keys=None,
+                 target_key=None):
         self.name = name
         self.parsed = parsed
         self.multiple_results = multiple_results
         self.required = required
         self.predicate = predicate
+        self.source_keys = source_keys
+        if source_keys is not None and target_key is None:
+            target_key = element_name_key
+        self.target_key = target_key
+
+    @property
+    def conditional(self):
+        return self.predicate is not None or self.source_keys is not None
 
 
 class Value(Requirement):
@@ -35,9 +62,13 @@ class Value(Requirement):
                  name,
                  multiple_results=False,
                  required=True,
-                 predicate=None):
+                 predicate=None,
+                 source_keys=None,
+                 target_key=None):
         super(Value, self).__init__(name,
                                     parsed=True,
                                     multiple_results=multiple_results,
                                     required=required,
-                                    predicate=predicate)
+                                    predicate=predicate,
+                                    source_keys=source_keys,
+                                    target_key=target_key)
@@ -0,0 +1,159 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import gc
+import sys
+import threading
+import time
+from StringIO import StringIO
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+
+# phases recorded by the parser
+CONTEXT = 'context'
+TOPOLOGICAL_SORT = 'topological_sort'
+SCHEMA = 'schema'
+REQUIREMENTS = 'requirements'
+VALIDATE = 'validate'
+PARSE = 'parse'
+CALCULATE_PROVIDED = 'calculate_provided'
+
+# phases recorded by disk_cache.DiskCache
+DISK_CACHE_HIT = 'disk_cache_hit'
+DISK_CACHE_MISS = 'disk_cache_miss'
+
+
+def _max_rss():
+    """The peak resident set size of the process in bytes, or None"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in kilobytes, except on OS X
+    if sys.platform != 'darwin':
+        max_rss *= 1024
+    return max_rss
+
+
+def _gc_allocations():
+    """
+    Objects tracked by the garbage collector allocated (less the ones
+    deallocated) so far, as counted by the collector since the oldest
+    generation was last collected.
+    """
+    count0, count1, count2 = gc.get_count()
+    threshold0, threshold1, _ = gc.get_threshold()
+    # each collection resets the count of the youngest generation once it
+    # passed its threshold, and is counted by the next generation. A
+    # collection of the middle generation resets its count as well.
+    collections = count1 + count2 * (threshold1 + 2)
+    return count0 + collections * (threshold0 + 1)
+
+
+def measure(stats, phase, element_cls):
+    """Context manager recording the time (and allocated objects) spent in
+    its block to ``stats``"""
+    return _Measurement(stats, phase, element_cls)
+
+
+class _Measurement(object):
+
+    def __init__(self, stats, phase, element_cls):
+        self.stats = stats
+        self.phase = phase
+        self.element_cls = element_cls
+
+    def __enter__(self):
+        self.allocations = _gc_allocations()
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.time() - self.start
+        # a collection of the oldest generation resets the counts
+        allocated = max(_gc_allocations() - self.allocations, 0)
+        self.stats.record(self.phase, self.element_cls, elapsed, allocated,
+                          _max_rss())
+
+
+class ParseStats(object):
+    """
+    Wall time, call count and allocated objects per parsing phase and
+    element class, and the peak resident set size of the process in bytes
+    measured at the end of each phase (``peak_memory``).
+
+    Allocated objects are the containers (dicts, lists, instances...)
+    created and still alive at the end of a phase, as counted by the
+    garbage collector of the whole process. They approximate the memory
+    allocated by each phase, as python 2 has no cheap way to count
+    allocated bytes, and phases during which the oldest generation is
+    collected are undercounted. The peak memory includes the memory used
+    by the process before parsing, and is not recorded where the resource
+    module is not available. Any object with a ``record`` method of the
+    same signature can be passed to the parser instead, to receive the
+    measurements as they are taken.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.peak_memory = None
+        self._lock = threading.Lock()
+
+    def record(self, phase, element_cls, elapsed, allocated=None,
+               memory=None):
+        key = (phase, element_cls.__name__)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = _Entry()
+            entry.calls += 1
+            entry.time += elapsed
+            if allocated is not None:
+                entry.allocated = (entry.allocated or 0) + allocated
+            if memory is not None and (self.peak_memory is None or
+                                       memory > self.peak_memory):
+                self.peak_memory = memory
+
+    def report(self):
+        """The entries as a table, slowest first"""
+        rows = sorted(self.entries.iteritems(),
+                      key=lambda (key, entry): (-entry.time, key))
+        report = StringIO()
+        report.write('{0:<20} {1:<40} {2:>8} {3:>10} {4:>12}\n'.format(
+            'phase', 'element', 'calls', 'time (s)', 'objects'))
+        for (phase, element_name), entry in rows:
+            report.write('{0:<20} {1:<40} {2:>8} {3:>10.4f} {4:>12}\n'.format(
+                phase,
+                element_name,
+                entry.calls,
+                entry.time,
+                '-' if entry.allocated is None else entry.allocated))
+        if self.peak_memory is not None:
+            report.write('peak memory: {0}\n'.format(self.peak_memory))
+        return report.getvalue()
+
+    def __str__(self):
+        return self.report()
+
+
+class _Entry(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.allocated = None
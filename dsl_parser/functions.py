@@ -13,8 +13,10 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import contextlib
 import pkg_resources
 import abc
+import threading
 
 from dsl_parser import (constants,
                         exceptions,
@@ -25,22 +27,57 @@ SELF = 'SELF'
 SOURCE = 'SOURCE'
 TARGET = 'TARGET'
 
+# the default function registry, a dict of function names to function
+# classes. Parser sessions use copies of it (see using_registry).
 TEMPLATE_FUNCTIONS = {}
 
+_current = threading.local()
 
-def register(fn=None, name=None):
+
+def register(fn=None, name=None, registry=None):
+    if registry is None:
+        registry = TEMPLATE_FUNCTIONS
     if fn is None:
         def partial(_fn):
-            return register(_fn, name=name)
+            return register(_fn, name=name, registry=registry)
         return partial
-    TEMPLATE_FUNCTIONS[name] = fn
-    fn.name = name
+    if isinstance(fn, type):
+        # function classes may be shared by several registries, each
+        # registry holds its own subclass carrying the registered name
+        registry[name] = type(fn)(fn.__name__, (fn,),
+                                  {'name': name, '__module__': fn.__module__})
+    else:
+        fn.name = name
+        registry[name] = fn
     return fn
 
 
-def unregister(name):
-    if name in TEMPLATE_FUNCTIONS:
-        del TEMPLATE_FUNCTIONS[name]
+def unregister(name, registry=None):
+    if registry is None:
+        registry = TEMPLATE_FUNCTIONS
+    if name in registry:
+        del registry[name]
+
+
+@contextlib.contextmanager
+def using_registry(registry):
+    """
+    Use ``registry`` instead of the default registry to parse functions in
+    the current thread, within the block.
+    """
+    previous = getattr(_current, 'registry', None)
+    _current.registry = registry
+    try:
+        yield registry
+    finally:
+        _current.registry = previous
+
+
+def current_registry():
+    registry = getattr(_current, 'registry', None)
+    if registry is None:
+        return TEMPLATE_FUNCTIONS
+    return registry
 
 
 def _register_entry_point_functions():
@@ -414,13 +451,14 @@ def _get_property_value(node_name,
 def parse(raw_function, scope=None, context=None, path=None):
     if isinstance(raw_function, dict) and len(raw_function) == 1:
         func_name = raw_function.keys()[0]
-        if func_name in TEMPLATE_FUNCTIONS:
+        registry = current_registry()
+        if func_name in registry:
             func_args = raw_function.values()[0]
-            return TEMPLATE_FUNCTIONS[func_name](func_args,
-                                                 scope=scope,
-                                                 context=context,
-                                                 path=path,
-                                                 raw=raw_function)
+            return registry[func_name](func_args,
+                                       scope=scope,
+                                       context=context,
+                                       path=path,
+                                       raw=raw_function)
     return raw_function
 
 
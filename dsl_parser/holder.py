@@ -14,8 +14,172 @@
 #    * limitations under the License.
 
 
+from array import array
+
+# source positions are packed into a single integer, one field per mark.
+# each mark is stored shifted by one so that 0 stands for a missing mark.
+_MARK_BITS = 32
+_MARK_MASK = (1 << _MARK_BITS) - 1
+_MARKS = 4
+_START_LINE, _START_COLUMN, _END_LINE, _END_COLUMN = range(_MARKS)
+
+
+def _pack(marks):
+    position = 0
+    for field, mark in enumerate(marks):
+        if mark is not None:
+            position |= (mark + 1) << (field * _MARK_BITS)
+    return position
+
+
+def _unpack(position, field):
+    mark = (position >> (field * _MARK_BITS)) & _MARK_MASK
+    return mark - 1 if mark else None
+
+
+class PositionTable(object):
+    """
+    Side table holding the source positions of all holders loaded from
+    a single file. Holders created by ``holder()`` only keep their node id
+    (an index into the table) and a reference to the table, which also
+    owns the filename.
+    """
+
+    __slots__ = ('filename', '_marks')
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._marks = array('l')
+
+    def __len__(self):
+        return len(self._marks) // _MARKS
+
+    def holder(self, value, start_line, start_column, end_line, end_column):
+        node_id = len(self)
+        self._marks.extend(-1 if mark is None else mark
+                           for mark in (start_line, start_column,
+                                        end_line, end_column))
+        result = Holder.__new__(Holder)
+        result.value = value
+        result._position = node_id
+        result._source = self
+        return result
+
+    def mark(self, node_id, field):
+        mark = self._marks[node_id * _MARKS + field]
+        return None if mark < 0 else mark
+
+    def set_mark(self, node_id, field, mark):
+        self._marks[node_id * _MARKS + field] = -1 if mark is None else mark
+
+
+def _mark_property(field):
+
+    def getter(self):
+        source = self._source
+        if isinstance(source, PositionTable):
+            return source.mark(self._position, field)
+        return _unpack(self._position, field)
+
+    def setter(self, mark):
+        source = self._source
+        if isinstance(source, PositionTable):
+            source.set_mark(self._position, field, mark)
+        else:
+            marks = self._marks()
+            marks[field] = mark
+            self._position = _pack(marks)
+
+    return property(getter, setter)
+
+
+def _scan(value, key):
+    for key_holder, value_holder in value.iteritems():
+        if key_holder.value == key:
+            return key_holder, value_holder
+    return None, None
+
+
+# marks an index that can not be built as some key value is unhashable
+_UNHASHABLE = object()
+
+
+class HolderDict(dict):
+    """
+    Dict of key holders to value holders, used as the value of dict
+    holders. It keeps a lazily built index of plain key ->
+    (key_holder, value_holder) for ``Holder.get_item``, which is updated
+    when items are set and dropped on any other change.
+    """
+
+    __slots__ = ('_index',)
+
+    def __init__(self, *args, **kwargs):
+        super(HolderDict, self).__init__(*args, **kwargs)
+        self._index = None
+
+    def __reduce__(self):
+        return HolderDict, (dict(self),)
+
+    def get_item(self, key):
+        index = self._index
+        if index is None:
+            index = self._index = self._build_index()
+        if index is not _UNHASHABLE:
+            try:
+                return index.get(key, (None, None))
+            except TypeError:
+                # unhashable key, fall back to scanning
+                pass
+        return _scan(self, key)
+
+    def _build_index(self):
+        index = {}
+        try:
+            for key_holder, value_holder in self.iteritems():
+                index.setdefault(key_holder.value,
+                                 (key_holder, value_holder))
+        except TypeError:
+            return _UNHASHABLE
+        return index
+
+    def __setitem__(self, key_holder, value_holder):
+        super(HolderDict, self).__setitem__(key_holder, value_holder)
+        index = self._index
+        if index is None or index is _UNHASHABLE:
+            self._index = None
+            return
+        try:
+            current = index.get(key_holder.value)
+        except TypeError:
+            self._index = None
+            return
+        # with several key holders of the same value, the indexed one stays
+        if current is None or current[0] is key_holder:
+            index[key_holder.value] = (key_holder, value_holder)
+
+    def _changed(method):
+        def wrapper(self, *args, **kwargs):
+            self._index = None
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    __delitem__ = _changed(dict.__delitem__)
+    clear = _changed(dict.clear)
+    pop = _changed(dict.pop)
+    popitem = _changed(dict.popitem)
+    setdefault = _changed(dict.setdefault)
+    update = _changed(dict.update)
+    del _changed
+
+
 class Holder(object):
 
+    # holders are created for every key and value of every loaded yaml,
+    # so they are slotted and keep their four source marks packed together
+    __slots__ = ('value', '_position', '_source')
+
     def __init__(self,
                  value,
                  start_line=None,
@@ -24,11 +188,39 @@ class Holder(object):
                  end_column=None,
                  filename=None):
         self.value = value
-        self.start_line = start_line
-        self.start_column = start_column
-        self.end_line = end_line
-        self.end_column = end_column
-        self.filename = filename
+        self._position = _pack((start_line, start_column,
+                                end_line, end_column))
+        self._source = filename
+
+    start_line = _mark_property(_START_LINE)
+    start_column = _mark_property(_START_COLUMN)
+    end_line = _mark_property(_END_LINE)
+    end_column = _mark_property(_END_COLUMN)
+
+    @property
+    def filename(self):
+        source = self._source
+        if isinstance(source, PositionTable):
+            return source.filename
+        return source
+
+    @filename.setter
+    def filename(self, filename):
+        if isinstance(self._source, PositionTable):
+            # detach from the side table, the marks are kept
+            self._position = _pack(self._marks())
+        self._source = filename
+
+    def _marks(self):
+        return [self.start_line, self.start_column,
+                self.end_line, self.end_column]
+
+    def __getstate__(self):
+        # holders in side table mode are pickled without their table
+        return self.value, _pack(self._marks()), self.filename
+
+    def __setstate__(self, state):
+        self.value, self._position, self._source = state
 
     def __str__(self):
         return '{0}<{1}.{2}-{3}.{4} [{5}]>'.format(
@@ -47,14 +239,14 @@ class Holder(object):
         return value_holder is not None
 
     def get_item(self, key):
-        if not isinstance(self.value, dict):
+        value = self.value
+        if not isinstance(value, dict):
             raise ValueError('Value is expected to be of type dict while it'
                              'is in fact of type {0}'
-                             .format(type(self.value).__name__))
-        for key_holder, value_holder in self.value.iteritems():
-            if key_holder.value == key:
-                return key_holder, value_holder
-        return None, None
+                             .format(type(value).__name__))
+        if isinstance(value, HolderDict):
+            return value.get_item(key)
+        return _scan(value, key)
 
     def restore(self):
         if isinstance(self.value, dict):
@@ -72,9 +264,9 @@ class Holder(object):
         if isinstance(obj, Holder):
             return obj
         if isinstance(obj, dict):
-            result = dict((Holder.of(key, filename=filename),
-                           Holder.of(value, filename=filename))
-                          for key, value in obj.iteritems())
+            result = HolderDict((Holder.of(key, filename=filename),
+                                 Holder.of(value, filename=filename))
+                                for key, value in obj.iteritems())
         elif isinstance(obj, list):
             result = [Holder.of(item, filename=filename) for item in obj]
         elif isinstance(obj, set):
@@ -16,7 +16,10 @@
 import contextlib
 import urllib2
 
-from dsl_parser import (functions,
+from dsl_parser import (cancellation as _cancellation,
+                        constants,
+                        disk_cache as _disk_cache,
+                        functions,
                         utils)
 from dsl_parser.framework import parser
 from dsl_parser.elements import blueprint
@@ -24,13 +27,42 @@ from dsl_parser.import_resolver.default_import_resolver import \
     DefaultImportResolver
 
 
-def parse_from_path(dsl_file_path, resources_base_url=None, resolver=None):
+def parse_from_path(dsl_file_path,
+                    resources_base_url=None,
+                    resolver=None,
+                    executor=None,
+                    stats=None,
+                    collect_errors=False,
+                    sections=None,
+                    element_cache=None,
+                    cancellation=None,
+                    yaml_cache=None,
+                    disk_cache=None):
     with open(dsl_file_path, 'r') as f:
         dsl_string = f.read()
-    return _parse(dsl_string, resources_base_url, dsl_file_path, resolver)
+    return _parse(dsl_string, resources_base_url, dsl_file_path, resolver,
+                  executor=executor, stats=stats,
+                  collect_errors=collect_errors,
+                  sections=sections,
+                  element_cache=element_cache,
+                  cancellation=cancellation,
+                  yaml_cache=yaml_cache,
+                  disk_cache=disk_cache)
 
 
-def parse_from_url(dsl_url, resources_base_url=None, resolver=None):
+def parse_from_url(dsl_url,
+                   resources_base_url=None,
+                   resolver=None,
+                   executor=None,
+                   stats=None,
+                   collect_errors=False,
+                   sections=None,
+                   element_cache=None,
+                   cancellation=None,
+                   yaml_cache=None,
+                   disk_cache=None):
+    if cancellation is not None:
+        cancellation.check()
     try:
         with contextlib.closing(urllib2.urlopen(dsl_url)) as f:
             dsl_string = f.read()
@@ -42,25 +74,215 @@ def parse_from_url(dsl_url, resources_base_url=None, resolver=None):
             # that specifies the missing url.
             e.msg = '{0} not found'.format(e.filename)
         raise
-    return _parse(dsl_string, resources_base_url, dsl_url, resolver)
+    return _parse(dsl_string, resources_base_url, dsl_url, resolver,
+                  executor=executor, stats=stats,
+                  collect_errors=collect_errors,
+                  sections=sections,
+                  element_cache=element_cache,
+                  cancellation=cancellation,
+                  yaml_cache=yaml_cache,
+                  disk_cache=disk_cache)
 
 
-def parse(dsl_string, resources_base_url=None, resolver=None):
-    return _parse(dsl_string, resources_base_url, resolver=resolver)
+def parse(dsl_string,
+          resources_base_url=None,
+          resolver=None,
+          executor=None,
+          stats=None,
+          collect_errors=False,
+          sections=None,
+          element_cache=None,
+          cancellation=None,
+          yaml_cache=None,
+          disk_cache=None):
+    return _parse(dsl_string, resources_base_url, resolver=resolver,
+                  executor=executor, stats=stats,
+                  collect_errors=collect_errors,
+                  sections=sections,
+                  element_cache=element_cache,
+                  cancellation=cancellation,
+                  yaml_cache=yaml_cache,
+                  disk_cache=disk_cache)
 
 
-def _parse(dsl_string, resources_base_url, dsl_location=None, resolver=None):
+class IncrementalParser(object):
+    """
+    Parses successive versions of a blueprint. Each parse reuses the
+    results of the previous successful parse for the parts of the
+    blueprint that did not change and returns the same plan a full parse
+    would return.
+    """
+
+    def __init__(self,
+                 resources_base_url=None,
+                 resolver=None,
+                 executor=None,
+                 stats=None,
+                 element_cache=None,
+                 yaml_cache=None):
+        self.resources_base_url = resources_base_url
+        self.resolver = resolver
+        self.executor = executor
+        self.stats = stats
+        self.element_cache = element_cache
+        self.yaml_cache = yaml_cache
+        self._context = None
+
+    def parse(self, dsl_string, dsl_location=None):
+        restored_values = {}
+        merged_blueprint_holder, resource_base = _merge_imports(
+            dsl_string=dsl_string,
+            resources_base_url=self.resources_base_url,
+            dsl_location=dsl_location,
+            resolver=self.resolver,
+            executor=self.executor,
+            stats=self.stats,
+            restored_values=restored_values,
+            yaml_cache=self.yaml_cache)
+        context = parser.parse_context(
+            value=merged_blueprint_holder,
+            inputs={
+                'resource_base': resource_base
+            },
+            element_cls=blueprint.Blueprint,
+            executor=self.executor,
+            previous_context=self._context,
+            stats=self.stats,
+            restored_values=restored_values,
+            element_cache=self.element_cache)
+        self._context = context
+        plan = context.parsed_value
+        functions.validate_functions(plan)
+        return plan
+
+    def parse_from_path(self, dsl_file_path):
+        with open(dsl_file_path, 'r') as f:
+            dsl_string = f.read()
+        return self.parse(dsl_string, dsl_location=dsl_file_path)
+
+
+def _parse(dsl_string,
+           resources_base_url,
+           dsl_location=None,
+           resolver=None,
+           executor=None,
+           stats=None,
+           collect_errors=False,
+           sections=None,
+           element_cache=None,
+           cancellation=None,
+           yaml_cache=None,
+           disk_cache=None):
+    with _cancellation.active(cancellation):
+        if disk_cache is None or sections is not None:
+            return _parse_active(dsl_string,
+                                 resources_base_url,
+                                 dsl_location=dsl_location,
+                                 resolver=resolver,
+                                 executor=executor,
+                                 stats=stats,
+                                 collect_errors=collect_errors,
+                                 sections=sections,
+                                 element_cache=element_cache,
+                                 yaml_cache=yaml_cache)
+
+        # plans are cached along with the content of their imports, which
+        # is recorded while parsing
+        resolver = resolver or DefaultImportResolver()
+        plan = disk_cache.get_plan(dsl_string, dsl_location,
+                                   resources_base_url, resolver, stats=stats)
+        if plan is not None:
+            return plan
+        recording_resolver = _disk_cache.RecordingResolver(resolver)
+        plan = _parse_active(dsl_string,
+                             resources_base_url,
+                             dsl_location=dsl_location,
+                             resolver=recording_resolver,
+                             executor=executor,
+                             stats=stats,
+                             collect_errors=collect_errors,
+                             sections=sections,
+                             element_cache=element_cache,
+                             yaml_cache=yaml_cache or disk_cache)
+        disk_cache.put_plan(dsl_string, dsl_location, resources_base_url,
+                            resolver, plan, recording_resolver.imports)
+        return plan
+
+
+def _parse_active(dsl_string,
+                  resources_base_url,
+                  dsl_location,
+                  resolver,
+                  executor,
+                  stats,
+                  collect_errors,
+                  sections,
+                  element_cache,
+                  yaml_cache):
+    # values restored from holders are shared by all passes
+    restored_values = {}
+    merged_blueprint_holder, resource_base = _merge_imports(
+        dsl_string=dsl_string,
+        resources_base_url=resources_base_url,
+        dsl_location=dsl_location,
+        resolver=resolver,
+        executor=executor,
+        stats=stats,
+        restored_values=restored_values,
+        yaml_cache=yaml_cache)
+
+    # parse blueprint, errors of the version and imports passes above are
+    # raised right away as the blueprint can not be parsed without them.
+    # element values are released as soon as they are no longer needed.
+    plan = parser.parse(
+        value=merged_blueprint_holder,
+        inputs={
+            'resource_base': resource_base
+        },
+        element_cls=blueprint.Blueprint,
+        executor=executor,
+        stats=stats,
+        restored_values=restored_values,
+        collect_errors=collect_errors,
+        sections=sections,
+        release=True,
+        element_cache=element_cache)
+
+    # functions are validated against nodes and outputs, so partial plans
+    # without them are not validated
+    if sections is None or (constants.NODES in plan and
+                            constants.OUTPUTS in plan):
+        functions.validate_functions(plan)
+    return plan
+
+
+def _merge_imports(dsl_string,
+                   resources_base_url,
+                   dsl_location,
+                   resolver,
+                   executor,
+                   stats,
+                   restored_values,
+                   yaml_cache=None):
     parsed_dsl_holder = utils.load_yaml(raw_yaml=dsl_string,
                                         error_message='Failed to parse DSL',
-                                        filename=dsl_location)
+                                        filename=dsl_location,
+                                        cache=yaml_cache)
 
     if not resolver:
         resolver = DefaultImportResolver()
 
+    # the version and imports passes only need a few top level keys, so
+    # they skip the rest of the blueprint (sparse)
+
     # validate version
     result = parser.parse(parsed_dsl_holder,
                           element_cls=blueprint.BlueprintVersionExtractor,
-                          strict=False)
+                          strict=False,
+                          executor=executor,
+                          stats=stats,
+                          sparse=True,
+                          restored_values=restored_values)
     version = result['plan_version']
 
     # handle imports
@@ -71,20 +293,13 @@ def _parse(dsl_string, resources_base_url, dsl_location=None, resolver=None):
             'resources_base_url': resources_base_url,
             'blueprint_location': dsl_location,
             'version': version,
-            'resolver': resolver
+            'resolver': resolver,
+            'yaml_cache': yaml_cache
         },
         element_cls=blueprint.BlueprintImporter,
-        strict=False)
-    resource_base = result['resource_base']
-    merged_blueprint_holder = result['merged_blueprint']
-
-    # parse blueprint
-    plan = parser.parse(
-        value=merged_blueprint_holder,
-        inputs={
-            'resource_base': resource_base
-        },
-        element_cls=blueprint.Blueprint)
-
-    functions.validate_functions(plan)
-    return plan
+        strict=False,
+        executor=executor,
+        stats=stats,
+        sparse=True,
+        restored_values=restored_values)
+    return result['merged_blueprint'], result['resource_base']
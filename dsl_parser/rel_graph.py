@@ -19,7 +19,8 @@ import random
 
 import networkx as nx
 
-from dsl_parser import constants
+from dsl_parser import (cancellation,
+                        constants)
 
 NODES = 'nodes'
 RELATIONSHIPS = 'relationships'
@@ -193,6 +194,7 @@ def _build_multi_instance_node_tree_rec(node_id,
                                         parent_relationship=None,
                                         parent_node_instance_id=None,
                                         current_host_instance_id=None):
+    cancellation.check()
     node = contained_tree.node[node_id]['node']
     containers = _build_and_update_node_instances(
         ctx=ctx,
@@ -393,6 +395,7 @@ def _handle_connected_to_and_depends_on(ctx):
             else:
                 target_node_instance_id = min(target_node_instance_ids)
             target_node_instance_ids = [target_node_instance_id]
+        cancellation.check()
         for source_node_instance_id in ctx.get_node_instance_ids_by_node_id(
                 source_node_id):
             for target_node_instance_id in target_node_instance_ids:
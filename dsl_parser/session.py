@@ -0,0 +1,132 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from dsl_parser import (functions,
+                        parser,
+                        tasks,
+                        yaml_loader)
+from dsl_parser.framework import cache
+from dsl_parser.import_resolver.default_import_resolver import \
+    DefaultImportResolver
+
+
+class ParserSession(object):
+    """
+    Parses blueprints and prepares deployment plans with its own function
+    registry, import resolver, element, yaml and disk caches and stats.
+
+    The function registry starts as a copy of the default registry.
+    Functions registered on a session are only known to that session, and
+    functions registered on the default registry afterwards are not.
+
+    Sessions do not share mutable state, so different sessions may parse
+    concurrently from different threads. A single session may be used by
+    several threads as well, as long as its functions are not registered
+    or unregistered meanwhile and its resolver and executor are thread
+    safe.
+    """
+
+    def __init__(self,
+                 resources_base_url=None,
+                 resolver=None,
+                 executor=None,
+                 stats=None,
+                 element_cache=None,
+                 yaml_cache=None,
+                 disk_cache=None):
+        self.resources_base_url = resources_base_url
+        self.resolver = resolver or DefaultImportResolver()
+        self.stats = stats
+        self.element_cache = element_cache or cache.ElementCache()
+        self.yaml_cache = yaml_cache or yaml_loader.HolderCache()
+        self.disk_cache = disk_cache
+        self.functions = dict(functions.TEMPLATE_FUNCTIONS)
+        self.executor = None
+        if executor is not None:
+            self.executor = _RegistryExecutor(executor, self.functions)
+
+    def register_function(self, fn=None, name=None):
+        return functions.register(fn, name=name, registry=self.functions)
+
+    def unregister_function(self, name):
+        functions.unregister(name, registry=self.functions)
+
+    def parse(self, dsl_string, cancellation=None):
+        with functions.using_registry(self.functions):
+            return parser.parse(dsl_string,
+                                cancellation=cancellation,
+                                **self._parse_kwargs())
+
+    def parse_from_path(self, dsl_file_path, cancellation=None):
+        with functions.using_registry(self.functions):
+            return parser.parse_from_path(dsl_file_path,
+                                          cancellation=cancellation,
+                                          **self._parse_kwargs())
+
+    def parse_from_url(self, dsl_url, cancellation=None):
+        with functions.using_registry(self.functions):
+            return parser.parse_from_url(dsl_url,
+                                         cancellation=cancellation,
+                                         **self._parse_kwargs())
+
+    def prepare_deployment_plan(self, plan, inputs=None, cancellation=None):
+        with functions.using_registry(self.functions):
+            return tasks.prepare_deployment_plan(plan,
+                                                 inputs=inputs,
+                                                 cancellation=cancellation)
+
+    def evaluate_functions(self, payload, context, get_node_instances_method,
+                           get_node_instance_method, get_node_method):
+        with functions.using_registry(self.functions):
+            return functions.evaluate_functions(payload, context,
+                                                get_node_instances_method,
+                                                get_node_instance_method,
+                                                get_node_method)
+
+    def evaluate_outputs(self, outputs_def, get_node_instances_method,
+                         get_node_instance_method, get_node_method):
+        with functions.using_registry(self.functions):
+            return functions.evaluate_outputs(outputs_def,
+                                              get_node_instances_method,
+                                              get_node_instance_method,
+                                              get_node_method)
+
+    def _parse_kwargs(self):
+        return {
+            'resources_base_url': self.resources_base_url,
+            'resolver': self.resolver,
+            'executor': self.executor,
+            'stats': self.stats,
+            'element_cache': self.element_cache,
+            'yaml_cache': self.yaml_cache,
+            'disk_cache': self.disk_cache
+        }
+
+
+class _RegistryExecutor(object):
+    # runs functions with the registry of the session in the threads of
+    # the executor, which do not see the registry of the calling thread
+
+    def __init__(self, executor, registry):
+        self._executor = executor
+        self._registry = registry
+
+    def map(self, func, iterable):
+        registry = self._registry
+
+        def call(item):
+            with functions.using_registry(registry):
+                return func(item)
+        return self._executor.map(call, iterable)
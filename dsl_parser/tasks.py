@@ -14,7 +14,8 @@
 #    * limitations under the License.
 
 
-from dsl_parser import (functions,
+from dsl_parser import (cancellation as _cancellation,
+                        functions,
                         exceptions,
                         scan,
                         parser,
@@ -53,14 +54,15 @@ def _process_functions(plan):
     scan.scan_service_template(plan, handler, replace=True)
 
 
-def prepare_deployment_plan(plan, inputs=None, **kwargs):
+def prepare_deployment_plan(plan, inputs=None, cancellation=None, **kwargs):
     """
     Prepare a plan for deployment
     """
-    plan = multi_instance.create_deployment_plan(plan)
-    _set_plan_inputs(plan, inputs)
-    _process_functions(plan)
-    return plan
+    with _cancellation.active(cancellation):
+        plan = multi_instance.create_deployment_plan(plan)
+        _set_plan_inputs(plan, inputs)
+        _process_functions(plan)
+        return plan
 
 
 def modify_deployment(nodes, previous_node_instances, modified_nodes):
@@ -0,0 +1,141 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+from multiprocessing.pool import ThreadPool
+
+import testtools
+
+from dsl_parser import (cancellation,
+                        exceptions,
+                        tasks)
+from dsl_parser.framework import (elements,
+                                  parser,
+                                  stats)
+from dsl_parser.parser import parse as dsl_parse
+from dsl_parser.tests.abstract_test_parser import AbstractTestParser
+
+
+BLUEPRINT = AbstractTestParser.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    type: {}
+node_templates:
+    node:
+        type: type
+"""
+
+
+class CancellingResolver(object):
+
+    def __init__(self, token):
+        self.token = token
+        self.fetched = []
+
+    def fetch_import(self, import_url):
+        self.fetched.append(import_url)
+        self.token.cancel()
+        return 'node_types: {}'
+
+
+class TestCancellation(testtools.TestCase):
+
+    def _element_classes(self, token, cancel_at):
+        processed = []
+
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def parse(self):
+                processed.append(self.name)
+                if self.name == cancel_at:
+                    token.cancel()
+                return self.initial_value
+
+        class TestElement(elements.Element):
+            schema = elements.List(type=TestLeaf)
+
+        return TestElement, processed
+
+    def test_token(self):
+        token = cancellation.CancellationToken()
+        token.check()
+        token.cancel()
+        self.assertTrue(token.cancelled)
+        self.assertRaises(exceptions.ParsingCancelledError, token.check)
+        token = cancellation.CancellationToken(timeout=0)
+        self.assertTrue(token.timed_out)
+        self.assertRaises(exceptions.ParsingTimeoutError, token.check)
+        token = cancellation.CancellationToken(timeout=60,
+                                               deadline=time.time() - 1)
+        self.assertTrue(token.timed_out)
+
+    def test_cancel_parse(self):
+        token = cancellation.CancellationToken()
+        element_cls, processed = self._element_classes(token, cancel_at=2)
+        parse_stats = stats.ParseStats()
+        error = self.assertRaises(exceptions.ParsingCancelledError,
+                                  parser.parse,
+                                  value=range(10),
+                                  element_cls=element_cls,
+                                  stats=parse_stats,
+                                  cancellation=token)
+        self.assertEqual([0, 1, 2], processed)
+        self.assertIs(parse_stats, error.stats)
+        self.assertEqual(3, parse_stats.entries[(stats.PARSE,
+                                                 'TestLeaf')].calls)
+
+    def test_cancel_parse_with_executor(self):
+        token = cancellation.CancellationToken()
+        element_cls, processed = self._element_classes(token, cancel_at=-1)
+        token.cancel()
+        pool = ThreadPool(4)
+        self.addCleanup(pool.close)
+        self.assertRaises(exceptions.ParsingCancelledError,
+                          parser.parse,
+                          value=range(10),
+                          element_cls=element_cls,
+                          executor=pool,
+                          cancellation=token)
+        self.assertEqual([], processed)
+
+    def test_parse_deadline(self):
+        token = cancellation.CancellationToken(timeout=0)
+        self.assertRaises(exceptions.ParsingTimeoutError,
+                          dsl_parse, BLUEPRINT, cancellation=token)
+
+    def test_cancel_import_fetching(self):
+        token = cancellation.CancellationToken()
+        resolver = CancellingResolver(token)
+        blueprint = BLUEPRINT + """
+imports:
+    -   http://www.example.com/first.yaml
+    -   http://www.example.com/second.yaml
+"""
+        self.assertRaises(exceptions.ParsingCancelledError,
+                          dsl_parse, blueprint,
+                          resolver=resolver,
+                          cancellation=token)
+        self.assertEqual(['http://www.example.com/first.yaml'],
+                         resolver.fetched)
+
+    def test_prepare_deployment_plan_deadline(self):
+        plan = dsl_parse(BLUEPRINT)
+        token = cancellation.CancellationToken(timeout=0)
+        self.assertRaises(exceptions.ParsingTimeoutError,
+                          tasks.prepare_deployment_plan,
+                          plan,
+                          cancellation=token)
+        self.assertIsNone(cancellation.current())
+        tasks.prepare_deployment_plan(plan)
@@ -0,0 +1,219 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+
+from dsl_parser import (disk_cache,
+                        functions,
+                        models,
+                        yaml_loader)
+from dsl_parser.disk_cache import DiskCache
+from dsl_parser.framework.stats import ParseStats
+from dsl_parser.import_resolver.default_import_resolver import \
+    DefaultImportResolver
+from dsl_parser.parser import parse_from_path
+from dsl_parser.session import ParserSession
+from dsl_parser.tests.abstract_test_parser import AbstractTestParser
+from dsl_parser.tests.test_yaml_loader import (YAML,
+                                               _tree)
+
+
+class TestDiskCache(AbstractTestParser):
+
+    def setUp(self):
+        super(TestDiskCache, self).setUp()
+        self.cache_dir = os.path.join(self._temp_dir, 'cache')
+
+    def _entries(self):
+        return os.listdir(self.cache_dir)
+
+    def test_holder_trees(self):
+        expected = DiskCache(self.cache_dir).load(YAML, 'file.yaml')
+        # a new cache, as used by another process
+        cache = DiskCache(self.cache_dir)
+        result = cache.load(YAML, 'file.yaml')
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertIsNot(expected, result)
+        self.assertEqual(_tree(expected), _tree(result))
+        cache.load(YAML, 'other.yaml')
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(2, len(self._entries()))
+        cache.load(YAML, 'file.yaml', loader=yaml_loader.MarkedLoader)
+        if yaml_loader.CMarkedLoader is not None:
+            self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test_changed_parser_sources(self):
+        DiskCache(self.cache_dir).load(YAML, 'file.yaml')
+        # as loaded by a source checkout that changed since
+        self.patch(disk_cache, '_sources_digest', 'changed')
+        cache = DiskCache(self.cache_dir)
+        cache.load(YAML, 'file.yaml')
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        cache = DiskCache(self.cache_dir)
+        cache.load(YAML, 'file.yaml')
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def test_corrupted_entry(self):
+        DiskCache(self.cache_dir).load('a: b', 'file.yaml')
+        entry, = self._entries()
+        with open(os.path.join(self.cache_dir, entry), 'w') as f:
+            f.write('corrupted')
+        cache = DiskCache(self.cache_dir)
+        self.assertEqual({'a': 'b'},
+                         cache.load('a: b', 'file.yaml').restore())
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual({'a': 'b'},
+                         cache.load('a: b', 'file.yaml').restore())
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_evicted_by_size(self):
+        cache = DiskCache(self.cache_dir)
+        cache.load('a: b', 'file1.yaml')
+        entry_size = os.path.getsize(
+            os.path.join(self.cache_dir, self._entries()[0]))
+        cache.max_bytes = 2 * entry_size
+        cache.load('a: b', 'file2.yaml')
+        cache.load('a: b', 'file3.yaml')
+        self.assertEqual(2, len(self._entries()))
+        cache.load('a: b', 'file4.yaml')
+        self.assertEqual(2, len(self._entries()))
+        cache.clear()
+        self.assertEqual([], self._entries())
+
+    def test_evicted_once_size_exceeded(self):
+        listed = []
+        listdir = os.listdir
+
+        def counting_listdir(path):
+            if path == self.cache_dir:
+                listed.append(path)
+            return listdir(path)
+        self.patch(os, 'listdir', counting_listdir)
+        cache = DiskCache(self.cache_dir)
+        cache.load('a: b', 'file1.yaml')
+        self.assertEqual(1, len(listed))
+        entry_size = os.path.getsize(
+            os.path.join(self.cache_dir, listdir(self.cache_dir)[0]))
+        cache.max_bytes = 3 * entry_size
+        # the size of the entries is counted as they are written
+        cache.load('a: b', 'file2.yaml')
+        cache.load('a: b', 'file3.yaml')
+        self.assertEqual(1, len(listed))
+        cache.load('a: b', 'file4.yaml')
+        self.assertEqual(2, len(listed))
+        self.assertEqual(3, len(listdir(self.cache_dir)))
+
+    def test_plans(self):
+        imported_yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    test_type:
+        properties:
+            key:
+                default: {0}
+"""
+        imported_path = self.make_yaml_file(imported_yaml.format('value1'))
+        blueprint_path = self.make_yaml_file(
+            self.BASIC_VERSION_SECTION_DSL_1_0 + """
+imports:
+    -   {0}
+node_templates:
+    test_node:
+        type: test_type
+""".format(imported_path))
+        plan = parse_from_path(blueprint_path)
+
+        cache = DiskCache(self.cache_dir)
+        self.assertEqual(plan, parse_from_path(blueprint_path,
+                                               disk_cache=cache))
+        cache = DiskCache(self.cache_dir)
+        result = parse_from_path(blueprint_path, disk_cache=cache)
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertIsInstance(result, models.Plan)
+        self.assertEqual(plan, result)
+
+        # the plan is parsed again once an import changes
+        with open(imported_path, 'w') as f:
+            f.write(imported_yaml.format('value2'))
+        cache = DiskCache(self.cache_dir)
+        result = parse_from_path(blueprint_path, disk_cache=cache)
+        self.assertEqual('value2', result['nodes'][0]['properties']['key'])
+        self.assertEqual(parse_from_path(blueprint_path), result)
+        self.assertFalse([entry for entry in self._entries()
+                          if entry.startswith('.')])
+
+    def _blueprint_with_import(self):
+        imported_path = self.make_yaml_file(
+            self.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    test_type:
+        properties:
+            key: {}
+""")
+        return self.make_yaml_file(
+            self.BASIC_VERSION_SECTION_DSL_1_0 + """
+imports:
+    -   {0}
+node_templates:
+    test_node:
+        type: test_type
+        properties:
+            key: {{ my_function: value }}
+""".format(imported_path)), imported_path
+
+    def test_plans_stats_and_failed_imports(self):
+        blueprint_path, imported_path = self._blueprint_with_import()
+        cache = DiskCache(self.cache_dir)
+        stats = ParseStats()
+        parse_from_path(blueprint_path, disk_cache=cache, stats=stats)
+        parse_from_path(blueprint_path, disk_cache=cache, stats=stats)
+        self.assertEqual(1, stats.entries[('disk_cache_miss',
+                                           'DiskCache')].calls)
+        self.assertEqual(1, stats.entries[('disk_cache_hit',
+                                           'DiskCache')].calls)
+
+        with open(blueprint_path) as f:
+            dsl_string = f.read()
+        resolver = DefaultImportResolver()
+        self.assertIsNotNone(cache.get_plan(dsl_string, blueprint_path, None,
+                                            resolver))
+        # imports that can not be fetched are a miss, not an error
+        os.remove(imported_path)
+        self.assertIsNone(cache.get_plan(dsl_string, blueprint_path, None,
+                                         resolver))
+
+    def test_plans_per_function_registry(self):
+        class FailingFunction(functions.Function):
+
+            def parse_args(self, args):
+                pass
+
+            def validate(self, plan):
+                raise ValueError('invalid')
+
+            def evaluate(self, plan):
+                pass
+
+            def evaluate_runtime(self, storage):
+                pass
+
+        blueprint_path, _ = self._blueprint_with_import()
+        session = ParserSession(disk_cache=DiskCache(self.cache_dir))
+        plan = session.parse_from_path(blueprint_path)
+        self.assertEqual({'my_function': 'value'},
+                         plan['nodes'][0]['properties']['key'])
+        other_session = ParserSession(disk_cache=DiskCache(self.cache_dir))
+        other_session.register_function(FailingFunction, name='my_function')
+        self.assertRaises(ValueError, other_session.parse_from_path,
+                          blueprint_path)
@@ -0,0 +1,110 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import testtools
+
+from dsl_parser.framework import graph
+
+
+class TestElementTree(testtools.TestCase):
+
+    def setUp(self):
+        super(TestElementTree, self).setUp()
+        #       0
+        #     /   \
+        #    1     4
+        #   / \
+        #  2   3
+        self.tree = graph.ElementTree()
+        root = self.tree.add()
+        first = self.tree.add(root)
+        self.tree.close(self.tree.add(first))
+        self.tree.close(self.tree.add(first))
+        self.tree.close(first)
+        self.tree.close(self.tree.add(root))
+        self.tree.close(root)
+        self.tree.build()
+
+    def test_children(self):
+        self.assertEqual([1, 4], list(self.tree.children(0)))
+        self.assertEqual([2, 3], list(self.tree.children(1)))
+        self.assertEqual([], list(self.tree.children(2)))
+
+    def test_descendants(self):
+        self.assertEqual([1, 2, 3, 4], list(self.tree.descendants(0)))
+        self.assertEqual([2, 3], list(self.tree.descendants(1)))
+        self.assertEqual([], list(self.tree.descendants(4)))
+
+    def test_ancestors(self):
+        self.assertEqual([1, 0], list(self.tree.ancestors(3)))
+        self.assertEqual([], list(self.tree.ancestors(0)))
+        self.assertEqual(graph.NO_PARENT, self.tree.parent(0))
+
+
+class TestDependencyGraph(testtools.TestCase):
+
+    def test_topological_sort(self):
+        dependency_graph = graph.DependencyGraph(4)
+        dependency_graph.add_edge(3, 0)
+        dependency_graph.add_edge(2, 0)
+        dependency_graph.add_edge(1, 2)
+        self.assertEqual([1, 3, 2, 0], dependency_graph.topological_sort())
+
+    def test_topological_sort_with_cycle(self):
+        dependency_graph = graph.DependencyGraph(4)
+        dependency_graph.add_edge(0, 1)
+        dependency_graph.add_edge(1, 2)
+        dependency_graph.add_edge(2, 1)
+        dependency_graph.add_edge(2, 3)
+        self.assertEqual([0], dependency_graph.topological_sort())
+
+    def test_topological_levels(self):
+        dependency_graph = graph.DependencyGraph(5)
+        dependency_graph.add_edge(3, 0)
+        dependency_graph.add_edge(2, 0)
+        dependency_graph.add_edge(1, 2)
+        dependency_graph.add_edge(4, 2)
+        levels = dependency_graph.topological_levels()
+        self.assertEqual([[1, 3, 4], [2], [0]], levels)
+        self.assertEqual(dependency_graph.topological_sort(),
+                         [node_id for level in levels for node_id in level])
+
+    def test_find_cycle(self):
+        dependency_graph = graph.DependencyGraph(6)
+        # long cycle 0 -> 1 -> 2 -> 3 -> 0 and a short one 0 -> 4 -> 0
+        dependency_graph.add_edge(0, 1)
+        dependency_graph.add_edge(1, 2)
+        dependency_graph.add_edge(2, 3)
+        dependency_graph.add_edge(3, 0)
+        dependency_graph.add_edge(0, 4)
+        dependency_graph.add_edge(4, 0)
+        dependency_graph.add_edge(4, 5)
+        self.assertEqual([0, 4], dependency_graph.find_cycle())
+        self.assertEqual([0, 1, 2, 3],
+                         dependency_graph.find_cycle([0, 1, 2, 3, 5]))
+        self.assertIsNone(dependency_graph.find_cycle([1, 2, 3, 4, 5]))
+
+    def test_find_self_cycle(self):
+        dependency_graph = graph.DependencyGraph(3)
+        dependency_graph.add_edge(0, 1)
+        dependency_graph.add_edge(2, 2)
+        self.assertEqual([2], dependency_graph.find_cycle())
+
+    def test_find_cycle_in_deep_graph(self):
+        size = 10000
+        dependency_graph = graph.DependencyGraph(size)
+        for node_id in xrange(size):
+            dependency_graph.add_edge(node_id, (node_id + 1) % size)
+        self.assertEqual(range(size), dependency_graph.find_cycle())
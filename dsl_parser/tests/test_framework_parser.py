@@ -13,13 +13,24 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import gc
+import os
+import subprocess
+import sys
+from multiprocessing.pool import (Pool,
+                                  ThreadPool)
+
 import testtools
 
-from dsl_parser import exceptions
+from dsl_parser import (exceptions,
+                        holder)
 
-from dsl_parser.framework import (parser,
+from dsl_parser.framework import (cache,
+                                  parser,
                                   elements,
-                                  requirements)
+                                  frozen,
+                                  requirements,
+                                  stats)
 
 
 class TestSchemaSchemaValidation(testtools.TestCase):
@@ -313,3 +324,883 @@ class TestSchemaValidation(testtools.TestCase):
             {'child': 'value'},
             TestElement,
             error_code=exceptions.ERROR_CODE_ILLEGAL_VALUE_ACCESS)
+
+
+class TestRequirements(testtools.TestCase):
+
+    def test_keyed_requirement(self):
+        class TestChild(elements.Element):
+            schema = elements.Leaf(type=str)
+            requires = {
+                'self': [requirements.Value(
+                    'refs',
+                    multiple_results=True,
+                    source_keys=lambda source: [source.initial_value])]
+            }
+
+            def parse(self, refs):
+                result = [self.name]
+                for ref in refs:
+                    result.extend(ref)
+                return result
+
+        class TestElement(elements.DictElement):
+            schema = elements.Dict(type=TestChild)
+
+        result = parser.parse(value={'a': 'b', 'b': 'c', 'c': 'none'},
+                              element_cls=TestElement)
+        self.assertEqual({'a': ['a', 'b', 'c'],
+                          'b': ['b', 'c'],
+                          'c': ['c']}, result)
+
+    def test_keyed_requirement_with_target_key_and_predicate(self):
+        class TestTarget(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestSource(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestTarget: [requirements.Value(
+                    'targets',
+                    multiple_results=True,
+                    source_keys=lambda source: [source.initial_value,
+                                                source.initial_value + 1],
+                    target_key=lambda target: target.initial_value,
+                    predicate=lambda source, target: target.name != 'skip')]
+            }
+
+            def parse(self, targets):
+                return sorted(targets)
+
+        class TestTargets(elements.DictElement):
+            schema = elements.Dict(type=TestTarget)
+
+        class TestRoot(elements.DictElement):
+            schema = {
+                'targets': TestTargets,
+                'source': TestSource
+            }
+
+        result = parser.parse(value={'targets': {'one': 1,
+                                                 'two': 2,
+                                                 'skip': 2,
+                                                 'three': 3},
+                                     'source': 1},
+                              element_cls=TestRoot)
+        self.assertEqual([1, 2], result['source'])
+
+
+class TestFrozenValues(testtools.TestCase):
+
+    def test_values_are_shared_and_read_only(self):
+        values = []
+
+        class TestChild(elements.Element):
+            schema = elements.Leaf(type=dict)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'child': TestChild
+            }
+
+            def parse(self):
+                values.append(self.child(TestChild).value)
+                values.append(self.child(TestChild).value)
+                return {'child': values[0]}
+
+        result = parser.parse(value={'child': {'key': ['value']}},
+                              element_cls=TestElement)
+        self.assertIs(values[0], values[1])
+        self.assertRaises(TypeError, values[0].update, {})
+        self.assertRaises(TypeError, values[0]['key'].append, 'other')
+        self.assertIs(dict, type(result['child']))
+        self.assertIs(list, type(result['child']['key']))
+        result['child']['key'].append('other')
+
+    def test_holders_are_not_thawed(self):
+        value_holder = holder.Holder.of({'key': ['value']})
+        self.assertIs(value_holder, frozen.thaw(value_holder))
+        result = frozen.thaw(frozen.freeze({'holder': value_holder}))
+        self.assertIs(value_holder, result['holder'])
+
+    def test_initial_values_are_restored_once_and_lazily(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=list)
+
+        class TestElement(elements.DictElement):
+            schema = elements.Dict(type=TestLeaf)
+
+        context = parser.Context(value={'a': [1], 'b': [2]},
+                                 element_cls=TestElement,
+                                 element_name='root',
+                                 inputs=None)
+        leaf_a, leaf_b = sorted(context.element_type_to_elements[TestLeaf],
+                                key=lambda e: e.name)
+        self.assertIs(elements.UNRESTORED, leaf_a._initial_value)
+        root_value = context.element_type_to_elements[
+            TestElement][0].initial_value
+        self.assertIs(elements.UNRESTORED, leaf_a._initial_value)
+        self.assertIs(root_value['a'], leaf_a.initial_value)
+        self.assertIs(root_value['b'], leaf_b.initial_value)
+
+
+class TestCompiledSchemaValidators(testtools.TestCase):
+
+    def test_validators_are_compiled_once_per_class(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=str)
+
+        class TestElement(elements.Element):
+            schema = {
+                'leaf': TestLeaf
+            }
+
+        parser.parse(value={'leaf': 'value'}, element_cls=TestElement)
+        validator = parser._compiled_schema_validator(TestElement, True)
+        parser.parse(value={'leaf': 'other'}, element_cls=TestElement)
+        self.assertIs(validator,
+                      parser._compiled_schema_validator(TestElement, True))
+        self.assertIsNot(validator,
+                         parser._compiled_schema_validator(TestElement,
+                                                           False))
+        self.assertIn(TestElement, parser._valid_schema_api_classes)
+
+    def test_invalid_schema_api_is_not_cached(self):
+        class TestElement(elements.Element):
+            schema = 1
+        for _ in range(2):
+            self.assertRaises(exceptions.DSLParsingSchemaAPIException,
+                              parser.validate_schema_api,
+                              element_cls=TestElement)
+
+    def test_schema_alternatives_dispatch_on_value_type(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=str)
+
+        class TestElement(elements.Element):
+            schema = [
+                elements.Leaf(type=str),
+                {
+                    'leaf': TestLeaf
+                },
+                elements.Leaf(type=int)
+            ]
+
+        for value in ['value', {'leaf': 'value'}, 1]:
+            parser.parse(value=value, element_cls=TestElement)
+        error = self.assertRaises(exceptions.DSLParsingFormatException,
+                                  parser.parse,
+                                  value=[1],
+                                  element_cls=TestElement)
+        self.assertIn("Expected 'integer' type but found 'list' type",
+                      str(error))
+        error = self.assertRaises(exceptions.DSLParsingFormatException,
+                                  parser.parse,
+                                  value={'other': 'value'},
+                                  element_cls=TestElement)
+        self.assertIn("Expected 'integer' type but found 'dict' type",
+                      str(error))
+
+        calls = []
+        original = parser._compile_type_check
+
+        def compile_type_check(expected_type):
+            check = original(expected_type)
+
+            def validate_value(element, value):
+                calls.append(expected_type)
+                check(element, value)
+            return validate_value
+        self.patch(parser, '_compile_type_check', compile_type_check)
+        validator = parser._compile_schema_alternatives(
+            [elements.Leaf(type=str), elements.List(type=TestLeaf)],
+            strict=True)
+        validator(None, [])
+        self.assertEqual([list], calls)
+
+
+class TestExecutor(testtools.TestCase):
+
+    def setUp(self):
+        super(TestExecutor, self).setUp()
+        self.pool = ThreadPool(4)
+        self.addCleanup(self.pool.close)
+
+    def test_parse_with_executor(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def parse(self):
+                return self.initial_value * 2
+
+        class TestElement(elements.DictElement):
+            schema = elements.Dict(type=TestLeaf)
+
+        value = dict(('key{0}'.format(i), i) for i in range(20))
+        result = parser.parse(value=value,
+                              element_cls=TestElement,
+                              executor=self.pool)
+        self.assertEqual(parser.parse(value=value, element_cls=TestElement),
+                         result)
+        self.assertEqual(38, result['key19'])
+
+    def test_executor_raises_first_serial_error(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def validate(self):
+                if self.initial_value < 0:
+                    raise exceptions.DSLParsingLogicException(
+                        200, str(self.name))
+
+        class TestElement(elements.Element):
+            schema = elements.List(type=TestLeaf)
+
+        value = [0, 1, 2, -3, 4, -5] * 5
+
+        def parse(executor=None):
+            return self.assertRaises(exceptions.DSLParsingLogicException,
+                                     parser.parse,
+                                     value=value,
+                                     element_cls=TestElement,
+                                     executor=executor)
+        serial_error = parse()
+        error = parse(executor=self.pool)
+        self.assertEqual(3, serial_error.element.name)
+        self.assertEqual(3, error.element.name)
+
+    def test_process_pool(self):
+        class TestElement(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        pool = Pool(1)
+        self.addCleanup(pool.terminate)
+        error = self.assertRaises(ValueError, parser.parse,
+                                  value=1,
+                                  element_cls=TestElement,
+                                  executor=pool)
+        self.assertIn('Process pool', str(error))
+
+
+class TestCollectErrors(testtools.TestCase):
+
+    def _element_classes(self):
+        processed = []
+
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def validate(self):
+                if self.initial_value < 0:
+                    raise exceptions.DSLParsingLogicException(
+                        200, str(self.name))
+
+            def parse(self):
+                processed.append(self.name)
+                return self.initial_value
+
+        class TestLeaves(elements.Element):
+            schema = elements.List(type=TestLeaf)
+
+        class TestTotal(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestLeaf: [requirements.Value('values',
+                                              multiple_results=True)]
+            }
+
+            def parse(self, values):
+                processed.append('total')
+                return sum(values)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'leaves': TestLeaves,
+                'total': TestTotal
+            }
+
+        return TestElement, processed
+
+    def test_collect_errors(self):
+        element_cls, processed = self._element_classes()
+        error = self.assertRaises(exceptions.DSLParsingErrorsException,
+                                  parser.parse,
+                                  value={'leaves': [1, -2, 3, -4],
+                                         'total': 0},
+                                  element_cls=element_cls,
+                                  collect_errors=True)
+        self.assertEqual(exceptions.ERROR_CODE_MULTIPLE_ERRORS,
+                         error.err_code)
+        self.assertEqual([1, 3], [e.element.name for e in error.errors])
+        self.assertIn('path: leaves.3', str(error))
+        # the total and the parents of the failed leaves depend on them
+        self.assertEqual([0, 2], sorted(processed))
+
+    def test_collect_single_error(self):
+        element_cls, _ = self._element_classes()
+        error = self.assertRaises(exceptions.DSLParsingLogicException,
+                                  parser.parse,
+                                  value={'leaves': [1, -2], 'total': 0},
+                                  element_cls=element_cls,
+                                  collect_errors=True)
+        self.assertEqual(200, error.err_code)
+
+    def test_collect_errors_with_executor(self):
+        element_cls, _ = self._element_classes()
+        pool = ThreadPool(4)
+        self.addCleanup(pool.close)
+        error = self.assertRaises(exceptions.DSLParsingErrorsException,
+                                  parser.parse,
+                                  value={'leaves': [-1, 2, -3, 4, -5],
+                                         'total': 0},
+                                  element_cls=element_cls,
+                                  executor=pool,
+                                  collect_errors=True)
+        self.assertEqual([0, 2, 4], [e.element.name for e in error.errors])
+
+    def test_collect_errors_without_errors(self):
+        element_cls, _ = self._element_classes()
+        result = parser.parse(value={'leaves': [1, 2], 'total': 0},
+                              element_cls=element_cls,
+                              collect_errors=True)
+        self.assertEqual(3, result['total'])
+
+
+class TestSections(testtools.TestCase):
+
+    def test_sections(self):
+        parsed = []
+
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def parse(self):
+                parsed.append(self.name)
+                return self.initial_value
+
+        class TestRequired(TestLeaf):
+            pass
+
+        class TestRequiring(TestLeaf):
+            requires = {
+                TestRequired: [requirements.Value('required')]
+            }
+
+            def parse(self, required):
+                parsed.append(self.name)
+                return self.initial_value + required
+
+        class TestRequiredHolder(elements.DictElement):
+            schema = {
+                'required': TestRequired
+            }
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'requiring': TestRequiring,
+                'holder': TestRequiredHolder,
+                'other': TestLeaf
+            }
+
+        self.assertEqual(
+            frozenset(['requiring', 'holder']),
+            parser.sections_closure(TestElement, ['requiring']))
+        result = parser.parse(value={'requiring': 1,
+                                     'holder': {'required': 2},
+                                     'other': 'not an int'},
+                              element_cls=TestElement,
+                              sections=['requiring'])
+        self.assertEqual({'requiring': 3, 'holder': {'required': 2}},
+                         result)
+        self.assertEqual(['required', 'requiring'], parsed)
+
+    def test_unknown_sections(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'key': TestLeaf
+            }
+        self.assertRaises(ValueError, parser.parse,
+                          value={'key': 1},
+                          element_cls=TestElement,
+                          sections=['missing'])
+
+
+class TestParseContext(testtools.TestCase):
+
+    def test_previous_context_reuse(self):
+        parsed = []
+
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def parse(self):
+                parsed.append(self.name)
+                return self.initial_value
+
+        class TestSum(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestLeaf: [requirements.Value('leaves',
+                                              multiple_results=True)]
+            }
+
+            def parse(self, leaves):
+                parsed.append(self.name)
+                return sum(leaves)
+
+        class TestLeaves(elements.DictElement):
+            schema = elements.Dict(type=TestLeaf)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'leaves': TestLeaves,
+                'sum': TestSum
+            }
+
+        def parse(value, previous_context=None):
+            del parsed[:]
+            return parser.parse_context(value=value,
+                                        element_cls=TestElement,
+                                        previous_context=previous_context)
+
+        context = parse({'leaves': {'a': 1, 'b': 2}, 'sum': 0})
+        self.assertEqual(3, context.parsed_value['sum'])
+        context = parse({'leaves': {'a': 1, 'b': 2}, 'sum': 0}, context)
+        self.assertEqual([], parsed)
+        context = parse({'leaves': {'a': 1, 'b': 3}, 'sum': 0}, context)
+        self.assertEqual(['b', 'sum'], parsed)
+        self.assertEqual(4, context.parsed_value['sum'])
+        context = parse({'leaves': {'a': 1, 'b': 3, 'c': 1}, 'sum': 0},
+                        context)
+        self.assertEqual(['c', 'sum'], sorted(parsed))
+        self.assertEqual(5, context.parsed_value['sum'])
+
+    def test_requirements_signature_order(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestRequiring(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestLeaf: [requirements.Value('leaves',
+                                              multiple_results=True),
+                           requirements.Value('leaf', required=False)]
+            }
+
+        class TestContext(object):
+            def __init__(self, keys):
+                self.keys = keys
+
+            def required_elements(self, element, required_type,
+                                  requirement):
+                return self.keys
+
+            def element_key(self, required_element):
+                return required_element
+
+        element = TestRequiring.__new__(TestRequiring)
+        signature = parser._requirements_signature(
+            TestContext(['a', 'b']), element)
+        reversed_signature = parser._requirements_signature(
+            TestContext(['b', 'a']), element)
+        # only the order of multiple results is part of the signature
+        self.assertNotEqual(signature[0], reversed_signature[0])
+        self.assertEqual(signature[1], reversed_signature[1])
+
+
+class TestElementLookups(testtools.TestCase):
+
+    def test_path_ancestor_and_sibling(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=str)
+
+        class TestOther(elements.Element):
+            schema = elements.Leaf(type=str)
+
+        class TestChild(elements.DictElement):
+            schema = {
+                'leaf': TestLeaf,
+                'other': TestOther
+            }
+
+        class TestElement(elements.DictElement):
+            schema = elements.Dict(type=TestChild)
+
+        context = parser.Context(value={'child': {'leaf': 'a',
+                                                  'other': 'b'}},
+                                 element_cls=TestElement,
+                                 element_name='root',
+                                 inputs=None)
+        root = context.element_type_to_elements[TestElement][0]
+        child = context.element_type_to_elements[TestChild][0]
+        leaf = context.element_type_to_elements[TestLeaf][0]
+        other = context.element_type_to_elements[TestOther][0]
+        self.assertEqual('root', root.path)
+        self.assertEqual('child', child.path)
+        self.assertEqual('child.leaf', leaf.path)
+        self.assertIs(child, leaf._parent())
+        self.assertIs(child, leaf.ancestor(TestChild))
+        self.assertIs(root, leaf.ancestor(TestElement))
+        self.assertIs(child, leaf.ancestor(TestChild))
+        self.assertIs(other, leaf.sibling(TestOther))
+        self.assertRaises(exceptions.DSLParsingElementMatchException,
+                          leaf.ancestor, TestLeaf)
+
+
+class TestParseStats(testtools.TestCase):
+
+    def test_stats(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestElement(elements.DictElement):
+            schema = elements.Dict(type=TestLeaf)
+
+        parse_stats = stats.ParseStats()
+        parser.parse(value={'a': 1, 'b': 2},
+                     element_cls=TestElement,
+                     stats=parse_stats)
+        for phase in [stats.SCHEMA, stats.REQUIREMENTS, stats.VALIDATE,
+                      stats.PARSE, stats.CALCULATE_PROVIDED]:
+            self.assertEqual(2, parse_stats.entries[(phase,
+                                                     'TestLeaf')].calls)
+            self.assertEqual(1, parse_stats.entries[(phase,
+                                                     'TestElement')].calls)
+        for phase in [stats.CONTEXT, stats.TOPOLOGICAL_SORT]:
+            self.assertEqual(1, parse_stats.entries[(phase,
+                                                     'TestElement')].calls)
+        report = parse_stats.report().splitlines()
+        if stats.resource is None:
+            self.assertEqual(13, len(report))
+        else:
+            self.assertLess(0, parse_stats.peak_memory)
+            # and the peak memory
+            self.assertEqual(14, len(report))
+        self.assertIn('TestLeaf', str(parse_stats))
+
+    def test_allocated_objects(self):
+        class TestElement(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def parse(self):
+                return [[] for _ in range(self.initial_value)]
+
+        # the collector resets its counts when it collects
+        gc.disable()
+        self.addCleanup(gc.enable)
+        parse_stats = stats.ParseStats()
+        parser.parse(value=1000,
+                     element_cls=TestElement,
+                     stats=parse_stats)
+        entries = parse_stats.entries
+        self.assertLessEqual(
+            1000, entries[(stats.PARSE, 'TestElement')].allocated)
+        self.assertGreater(
+            1000, entries[(stats.VALIDATE, 'TestElement')].allocated)
+
+    def test_peak_memory(self):
+        class TestElement(elements.Element):
+            pass
+
+        parse_stats = stats.ParseStats()
+        parse_stats.record(stats.PARSE, TestElement, 0.1)
+        self.assertIsNone(parse_stats.peak_memory)
+        for memory in [10, 30, 20]:
+            parse_stats.record(stats.PARSE, TestElement, 0.1, 1, memory)
+        self.assertEqual(30, parse_stats.peak_memory)
+        self.assertIn('peak memory: 30', parse_stats.report())
+
+
+class TestRelease(testtools.TestCase):
+
+    def test_release(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestSum(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestLeaf: [requirements.Value('values',
+                                              multiple_results=True)]
+            }
+
+            def parse(self, values):
+                return self.initial_value + sum(values)
+
+        class TestLeaves(elements.Element):
+            schema = elements.List(type=TestLeaf)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'leaves': TestLeaves,
+                'sum': TestSum
+            }
+
+        value = {'leaves': [1, 2, 3], 'sum': 10}
+        context = parser.Context(value=value,
+                                 element_cls=TestElement,
+                                 element_name='root',
+                                 inputs=None)
+        releaser = parser._ElementRelease(context)
+        leaves = context.element_type_to_elements[TestLeaf]
+        for element in context.elements_graph_topological_sort():
+            parser.Parser._validate_element_schema(element, strict=True)
+            parser._parser._process_element(element)
+            releaser.processed(element)
+        root = context.element_type_to_elements[TestElement][0]
+        self.assertEqual({'leaves': [1, 2, 3], 'sum': 16}, root.value)
+        for element in leaves:
+            self.assertIs(elements.RELEASED, element._parsed_value)
+            self.assertIsNone(element.initial_value_holder)
+        error = self.assertRaises(exceptions.DSLParsingSchemaAPIException,
+                                  lambda: leaves[0].value)
+        self.assertEqual(exceptions.ERROR_CODE_ILLEGAL_VALUE_ACCESS,
+                         error.err_code)
+        self.assertEqual(
+            parser.parse(value=value, element_cls=TestElement),
+            parser.parse(value=value, element_cls=TestElement, release=True))
+
+    def test_release_peak_memory(self):
+        if stats.resource is None:
+            self.skipTest('the peak memory is not recorded')
+
+        def peak_memory(release):
+            # the peak memory of a process never decreases, so every
+            # blueprint is parsed by a new process
+            process = subprocess.Popen(
+                [sys.executable, '-c', PEAK_MEMORY_SCRIPT, str(release)],
+                cwd=os.path.dirname(os.path.dirname(os.path.dirname(
+                    os.path.abspath(__file__)))),
+                stdout=subprocess.PIPE)
+            output, _ = process.communicate()
+            self.assertEqual(0, process.returncode)
+            return int(output)
+
+        self.assertGreater(peak_memory(release=False),
+                           peak_memory(release=True))
+
+
+PEAK_MEMORY_SCRIPT = '''
+import sys
+
+from dsl_parser import yaml_loader
+from dsl_parser.elements import blueprint
+from dsl_parser.framework import (parser,
+                                  stats)
+
+node_templates = ''.join("""
+    node{0}:
+        type: test_type
+        properties:
+            key: {{ values: [{0}, {{ value: {0} }}] }}
+        relationships:
+            -   type: cloudify.relationships.depends_on
+                target: node{1}
+""".format(i, i - 1) for i in range(1, 1000))
+holder = yaml_loader.load("""
+tosca_definitions_version: cloudify_dsl_1_0
+node_types:
+    test_type:
+        properties:
+            key:
+                default: value
+relationships:
+    cloudify.relationships.depends_on: {}
+node_templates:
+    node0:
+        type: test_type
+""" + node_templates, None)
+parse_stats = stats.ParseStats()
+parser.parse(value=holder,
+             inputs={'resource_base': None},
+             element_cls=blueprint.Blueprint,
+             stats=parse_stats,
+             release=sys.argv[1] == 'True')
+print parse_stats.peak_memory
+'''
+
+
+class TestElementCache(testtools.TestCase):
+
+    def test_lru(self):
+        element_cache = cache.ElementCache(max_size=2)
+        element_cache.put('a', 1)
+        element_cache.put('b', 2)
+        self.assertEqual(1, element_cache.get('a'))
+        element_cache.put('c', 3)
+        self.assertIsNone(element_cache.get('b'))
+        self.assertEqual(1, element_cache.get('a'))
+        self.assertEqual(3, element_cache.get('c'))
+        self.assertEqual(2, len(element_cache))
+        self.assertEqual((3, 1), (element_cache.hits, element_cache.misses))
+
+    def test_parse_with_element_cache(self):
+        parsed = []
+
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestCached(elements.Element):
+            cacheable = True
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestLeaf: [requirements.Value('base')]
+            }
+
+            def parse(self, base):
+                parsed.append(self.name)
+                return self.initial_value + base
+
+        class TestCachedElements(elements.DictElement):
+            schema = elements.Dict(type=TestCached)
+
+        class TestElement(elements.DictElement):
+            schema = {
+                'base': TestLeaf,
+                'cached': TestCachedElements
+            }
+
+        element_cache = cache.ElementCache()
+
+        def parse(value):
+            return parser.parse(value=value,
+                                element_cls=TestElement,
+                                element_cache=element_cache)
+        value = {'base': 10, 'cached': {'a': 1, 'b': 2}}
+        self.assertEqual({'base': 10, 'cached': {'a': 11, 'b': 12}},
+                         parse(value))
+        self.assertEqual(['a', 'b'], sorted(parsed))
+        self.assertEqual({'base': 10, 'cached': {'a': 11, 'b': 12}},
+                         parse(value))
+        self.assertEqual(2, len(parsed))
+        self.assertEqual(2, element_cache.hits)
+        # a different requirement value or initial value is a miss
+        self.assertEqual({'base': 20, 'cached': {'a': 21, 'b': 3}},
+                         parse({'base': 20, 'cached': {'a': 1, 'b': -17}}))
+        self.assertEqual(4, len(parsed))
+        self.assertEqual(2, element_cache.hits)
+
+
+class TestSparseParse(testtools.TestCase):
+
+    def test_sparse_context_skips_unknown_keys(self):
+        class TestLeaf(elements.Element):
+            schema = elements.Leaf(type=str)
+
+        class TestElement(elements.Element):
+            schema = {
+                'known': TestLeaf
+            }
+
+        value = {'known': 'value', 'unknown': {'large': ['value']}}
+        context = parser.Context(value=value,
+                                 element_cls=TestElement,
+                                 element_name='root',
+                                 inputs=None,
+                                 sparse=True)
+        self.assertNotIn(elements.UnknownElement,
+                         context.element_type_to_elements)
+        self.assertEqual(2, len(context._elements))
+        root = context.element_type_to_elements[TestElement][0]
+        parser.Parser._validate_element_schema(root, strict=False)
+        self.assertIs(elements.UNRESTORED, root._initial_value)
+
+    def test_shared_restored_values_follow_holder_changes(self):
+        restored_values = {}
+        value_holder = holder.Holder.of({'key': 'value'})
+        restored = frozen.restore(value_holder, restored_values)
+        self.assertIs(restored, frozen.restore(value_holder,
+                                               restored_values))
+        value_holder.value[holder.Holder('other')] = holder.Holder('value')
+        self.assertEqual({'key': 'value', 'other': 'value'},
+                         frozen.restore(value_holder, restored_values))
+
+    def test_type_requirements_use_barrier_nodes(self):
+        class TestTarget(elements.Element):
+            schema = elements.Leaf(type=int)
+
+        class TestSource(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestTarget: [requirements.Value('targets',
+                                                multiple_results=True)]
+            }
+
+            def parse(self, targets):
+                return sum(targets)
+
+        class TestTargets(elements.DictElement):
+            schema = elements.Dict(type=TestTarget)
+
+        class TestSources(elements.DictElement):
+            schema = elements.Dict(type=TestSource)
+
+        class TestRoot(elements.DictElement):
+            schema = {
+                'targets': TestTargets,
+                'sources': TestSources
+            }
+
+        value = {
+            'targets': dict(('t{0}'.format(i), i) for i in range(10)),
+            'sources': dict(('s{0}'.format(i), i) for i in range(10))
+        }
+        context = parser.Context(value=value,
+                                 element_cls=TestRoot,
+                                 element_name='root',
+                                 inputs=None)
+        # 22 tree edges, 10 edges into the barrier and 10 out of it
+        self.assertEqual(42, len(list(context.element_graph.edges())))
+        result = parser.parse(value=value, element_cls=TestRoot)
+        self.assertEqual(45, result['sources']['s3'])
+
+    def test_type_requirements_resolved_once(self):
+        resolutions = []
+        resolve_requirement = parser._resolve_requirement
+
+        def counting_resolve_requirement(element, required_type,
+                                         requirement):
+            resolutions.append(requirement.name)
+            return resolve_requirement(element, required_type, requirement)
+        self.patch(parser, '_resolve_requirement',
+                   counting_resolve_requirement)
+
+        class TestTarget(elements.Element):
+            schema = elements.Leaf(type=int)
+
+            def calculate_provided(self):
+                return {'provided_value': self.initial_value}
+
+        class TestSource(elements.Element):
+            schema = elements.Leaf(type=int)
+            requires = {
+                TestTarget: [requirements.Requirement(
+                    'provided_value', multiple_results=True)]
+            }
+
+            def parse(self, provided_value):
+                return sorted(provided_value)
+
+        class TestTargets(elements.DictElement):
+            schema = elements.Dict(type=TestTarget)
+
+        class TestSources(elements.DictElement):
+            schema = elements.Dict(type=TestSource)
+
+        class TestRoot(elements.DictElement):
+            schema = {
+                'targets': TestTargets,
+                'sources': TestSources
+            }
+
+        context = parser.parse_context(
+            value={'targets': {'x': 7, 'y': 8, 'z': 9},
+                   'sources': {'a': 1, 'b': 2, 'c': 3}},
+            element_cls=TestRoot)
+        self.assertEqual(['provided_value'], resolutions)
+        self.assertEqual(1, len(context.resolved_requirements))
+        self.assertEqual({'a': [7, 8, 9], 'b': [7, 8, 9], 'c': [7, 8, 9]},
+                         context.parsed_value['sources'])
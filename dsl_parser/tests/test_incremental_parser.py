@@ -0,0 +1,118 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from dsl_parser import exceptions
+from dsl_parser.parser import IncrementalParser
+from dsl_parser.parser import parse as dsl_parse
+from dsl_parser.tests.abstract_test_parser import AbstractTestParser
+
+
+BLUEPRINT = AbstractTestParser.BASIC_VERSION_SECTION_DSL_1_0 + """
+inputs:
+    port:
+        default: 8080
+node_types:
+    cloudify.nodes.Compute: {{}}
+    vm_type:
+        derived_from: cloudify.nodes.Compute
+        properties:
+            ip: {{}}
+    app_type:
+        properties:
+            port: {{}}
+        interfaces:
+            lifecycle:
+                start: plugin.start
+relationships:
+    cloudify.relationships.contained_in: {{}}
+    cloudify.relationships.connected_to: {{}}
+plugins:
+    plugin:
+        executor: {executor}
+        source: dummy
+node_templates:
+    vm:
+        type: vm_type
+        properties:
+            ip: {ip}
+    app:
+        type: app_type
+        properties:
+            port: {{ get_input: port }}
+        relationships:
+            -   type: {relationship}
+                target: vm
+{extra_node}
+outputs:
+    ip:
+        value: {{ get_property: [vm, ip] }}
+"""
+
+EXTRA_NODE = """
+    vm2:
+        type: vm_type
+        properties:
+            ip: 10.0.0.2
+"""
+
+
+def blueprint(ip='10.0.0.1',
+              relationship='cloudify.relationships.contained_in',
+              executor='host_agent',
+              extra_node=''):
+    return BLUEPRINT.format(ip=ip,
+                            relationship=relationship,
+                            executor=executor,
+                            extra_node=extra_node)
+
+
+class TestIncrementalParser(AbstractTestParser):
+
+    def setUp(self):
+        super(TestIncrementalParser, self).setUp()
+        self.parser = IncrementalParser()
+
+    def assert_parse(self, dsl_string):
+        plan = self.parser.parse(dsl_string)
+        self.assertEqual(dsl_parse(dsl_string), plan)
+        return plan
+
+    def test_unchanged_blueprint_reuses_all_elements(self):
+        self.assert_parse(blueprint())
+        self.assert_parse(blueprint())
+        context = self.parser._context
+        self.assertEqual(len(context._elements), context.reused_elements)
+
+    def test_changes(self):
+        self.assert_parse(blueprint())
+        plan = self.assert_parse(blueprint(ip='10.0.0.9'))
+        self.assertEqual('10.0.0.9',
+                         self.get_node_by_name(plan, 'vm')['properties']['ip'])
+        context = self.parser._context
+        self.assertLess(0, context.reused_elements)
+        self.assertLess(context.reused_elements, len(context._elements))
+        self.assert_parse(blueprint(executor='central_deployment_agent'))
+        self.assert_parse(blueprint(extra_node=EXTRA_NODE))
+        self.assert_parse(blueprint(
+            relationship='cloudify.relationships.connected_to',
+            executor='central_deployment_agent'))
+        self.assert_parse(blueprint())
+
+    def test_error_keeps_previous_parse(self):
+        self.assert_parse(blueprint())
+        self.assertRaises(exceptions.DSLParsingException,
+                          self.parser.parse,
+                          blueprint(relationship='missing'))
+        self.assert_parse(blueprint(ip='10.0.0.3'))
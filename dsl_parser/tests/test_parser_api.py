@@ -16,6 +16,7 @@
 import os
 import socket
 import StringIO
+from multiprocessing.pool import ThreadPool
 from urllib2 import HTTPError
 import yaml as yml
 
@@ -25,10 +26,19 @@ from dsl_parser.interfaces.constants import NO_OP
 from dsl_parser.tests.abstract_test_parser import AbstractTestParser
 from dsl_parser.parser import parse_from_path, parse_from_url
 from dsl_parser.parser import parse as dsl_parse
+from dsl_parser import yaml_loader
+from dsl_parser.elements import blueprint
+from dsl_parser.framework import parser as framework_parser
 from dsl_parser import version
 from dsl_parser import models
 from dsl_parser.interfaces.utils import operation_mapping
 from dsl_parser.constants import TYPE_HIERARCHY
+from dsl_parser.elements.node_templates import NodeTemplate
+from dsl_parser.exceptions import DSLParsingErrorsException
+from dsl_parser.framework.cache import ElementCache
+from dsl_parser.yaml_loader import HolderCache
+from dsl_parser.import_resolver.default_import_resolver import \
+    DefaultImportResolver
 
 
 def op_struct(plugin_name,
@@ -3305,6 +3315,147 @@ node_templates:
             'prop1': 'val2',
         }, node2['properties'])
 
+    def test_parse_with_executor(self):
+        yaml = self.BASIC_NODE_TEMPLATES_SECTION + """
+    test_node2:
+        type: test_type
+        properties:
+            key: "val2"
+        relationships:
+            -   type: cloudify.relationships.contained_in
+                target: test_node
+relationships:
+    cloudify.relationships.contained_in: {}
+""" + self.BASIC_PLUGIN + self.BASIC_TYPE
+        dsl_string = self.BASIC_VERSION_SECTION_DSL_1_0 + yaml
+        pool = ThreadPool(4)
+        try:
+            result = dsl_parse(dsl_string, executor=pool)
+        finally:
+            pool.close()
+        self.assertEqual(dsl_parse(dsl_string), result)
+
+    def test_parse_collect_errors(self):
+        yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_templates:
+    test_node1:
+        type: missing_type1
+    test_node2:
+        type: missing_type2
+node_types: {}
+"""
+        error = self.assertRaises(DSLParsingErrorsException,
+                                  dsl_parse, yaml, collect_errors=True)
+        self.assertEqual(
+            ['test_node1', 'test_node2'],
+            sorted(e.element.ancestor(NodeTemplate).name
+                   for e in error.errors))
+
+    def test_parse_sections(self):
+        yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + \
+            self.BASIC_NODE_TEMPLATES_SECTION + self.BASIC_PLUGIN + \
+            self.BASIC_TYPE + """
+workflows:
+    workflow1: test_plugin.workflow1
+outputs:
+    output1:
+        value: { get_attribute: [ test_node, key ] }
+"""
+        plan = dsl_parse(yaml)
+        workflows_plan = dsl_parse(yaml, sections=['workflows', 'plugins'])
+        self.assertEqual(
+            set([constants.WORKFLOWS, constants.WORKFLOW_PLUGINS_TO_INSTALL,
+                 constants.VERSION]),
+            set(workflows_plan))
+        for key in workflows_plan:
+            self.assertEqual(plan[key], workflows_plan[key])
+        outputs_plan = dsl_parse(yaml, sections=['outputs'])
+        self.assertEqual({constants.OUTPUTS: plan[constants.OUTPUTS]},
+                         outputs_plan)
+
+    def test_parse_with_element_cache(self):
+        yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + \
+            self.BASIC_NODE_TEMPLATES_SECTION + self.BASIC_PLUGIN + \
+            self.BASIC_TYPE + """
+relationships:
+    cloudify.relationships.contained_in: {}
+"""
+        element_cache = ElementCache()
+        plan = dsl_parse(yaml, element_cache=element_cache)
+        self.assertEqual(0, element_cache.hits)
+        self.assertEqual(plan, dsl_parse(yaml, element_cache=element_cache))
+        self.assertEqual(element_cache.misses, element_cache.hits)
+        self.assertEqual(dsl_parse(yaml), plan)
+
+    def test_parse_with_yaml_cache(self):
+        imported_yaml1 = self.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    type1: {}
+"""
+        imported_yaml2 = self.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    type2: {}
+"""
+        yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + """
+imports:
+    -   {0}
+    -   {1}
+node_templates:
+    node1:
+        type: type1
+    node2:
+        type: type2
+""".format(self.make_yaml_file(imported_yaml1),
+           self.make_yaml_file(imported_yaml2))
+        yaml_cache = HolderCache()
+        plan = dsl_parse(yaml, yaml_cache=yaml_cache)
+        self.assertEqual((0, 3), (yaml_cache.hits, yaml_cache.misses))
+        # merging imports must not change the cached trees
+        self.assertEqual(plan, dsl_parse(yaml, yaml_cache=yaml_cache))
+        self.assertEqual((3, 3), (yaml_cache.hits, yaml_cache.misses))
+        self.assertEqual(dsl_parse(yaml), plan)
+
+    def test_restored_values_shared_across_passes(self):
+        yaml = self.BASIC_VERSION_SECTION_DSL_1_0 + \
+            self.BASIC_NODE_TEMPLATES_SECTION + self.BASIC_PLUGIN + \
+            self.BASIC_TYPE
+        parsed_dsl_holder = yaml_loader.load(yaml, None)
+        restored_values = {}
+        result = framework_parser.parse(
+            value=parsed_dsl_holder,
+            element_cls=blueprint.BlueprintVersionExtractor,
+            strict=False,
+            sparse=True,
+            restored_values=restored_values)
+        result = framework_parser.parse(
+            value=parsed_dsl_holder,
+            inputs={
+                'main_blueprint_holder': parsed_dsl_holder,
+                'resources_base_url': None,
+                'blueprint_location': None,
+                'version': result['plan_version'],
+                'resolver': DefaultImportResolver(),
+                'yaml_cache': None
+            },
+            element_cls=blueprint.BlueprintImporter,
+            strict=False,
+            sparse=True,
+            restored_values=restored_values)
+        merged_blueprint_holder = result['merged_blueprint']
+        # the merged blueprint shares the holders of the loaded blueprint
+        self.assertIs(parsed_dsl_holder.get_item('node_templates')[1],
+                      merged_blueprint_holder.get_item('node_templates')[1])
+        framework_parser.parse(value=merged_blueprint_holder,
+                               inputs={'resource_base': None},
+                               element_cls=blueprint.Blueprint,
+                               restored_values=restored_values)
+        # so the version holder is only restored by the version pass
+        version_holders = [entry[0] for entry in restored_values.values()
+                           if entry[1] == 'cloudify_dsl_1_0']
+        self.assertEqual(
+            [parsed_dsl_holder.get_item('tosca_definitions_version')[1]],
+            version_holders)
+
 
 class DeploymentPluginsToInstallTest(AbstractTestParser):
 
@@ -0,0 +1,135 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from multiprocessing.pool import ThreadPool
+
+import testtools
+
+from dsl_parser import functions
+from dsl_parser.session import ParserSession
+from dsl_parser.tests.abstract_test_parser import AbstractTestParser
+
+
+BLUEPRINT = AbstractTestParser.BASIC_VERSION_SECTION_DSL_1_0 + """
+node_types:
+    type:
+        properties:
+            property:
+                type: string
+                default: {{ transform: default }}
+node_templates:
+{nodes}
+outputs:
+    output:
+        value: {{ transform: {name} }}
+"""
+
+NODE = """
+    node{0}:
+        type: type
+        properties:
+            property: {{ transform: value{0} }}
+"""
+
+
+class _FunctionName(functions.Function):
+
+    def parse_args(self, args):
+        pass
+
+    def validate(self, plan):
+        pass
+
+    def evaluate(self, plan):
+        return self.name
+
+    def evaluate_runtime(self, storage):
+        return self.name
+
+
+def _transform_function(transform):
+    class Transform(functions.Function):
+
+        def parse_args(self, args):
+            self.arg = args
+
+        def validate(self, plan):
+            pass
+
+        def evaluate(self, plan):
+            return transform(self.arg)
+
+        def evaluate_runtime(self, storage):
+            return transform(self.arg)
+    return Transform
+
+
+class TestParserSession(testtools.TestCase):
+
+    def test_session_functions(self):
+        session = ParserSession()
+        session.register_function(_transform_function(str.upper),
+                                  name='transform')
+        self.assertNotIn('transform', functions.TEMPLATE_FUNCTIONS)
+        plan = session.prepare_deployment_plan(session.parse(
+            BLUEPRINT.format(nodes=NODE.format(0), name='output')))
+        self.assertEqual('OUTPUT', plan['outputs']['output']['value'])
+        self.assertEqual('VALUE0', plan['nodes'][0]['properties']['property'])
+        session.unregister_function('transform')
+        self.assertNotIn('transform', session.functions)
+
+    def test_concurrent_sessions(self):
+        transforms = [str.upper, str.lower, lambda value: value[::-1]]
+        sessions = []
+        for transform in transforms:
+            executor = ThreadPool(2)
+            self.addCleanup(executor.close)
+            session = ParserSession(executor=executor)
+            session.register_function(_transform_function(transform),
+                                      name='transform')
+            # the same function class is registered under a different
+            # name by every session
+            function_name = 'function_name{0}'.format(len(sessions))
+            session.register_function(_FunctionName, name=function_name)
+            sessions.append((session, transform, function_name))
+        self.assertEqual('function', _FunctionName.name)
+
+        def parse(index):
+            session, transform, function_name = \
+                sessions[index % len(sessions)]
+            nodes = ''.join(NODE.format(i) for i in range(index % 5 + 1))
+            name = 'Output{0}'.format(index)
+            plan = session.prepare_deployment_plan(session.parse(
+                BLUEPRINT.format(nodes=nodes, name=name) + """
+    function_name:
+        value: {{ {0}: arg }}
+""".format(function_name)))
+            properties = sorted(node['properties']['property']
+                                for node in plan['nodes'])
+            return (plan['outputs']['output']['value'], properties,
+                    plan['outputs']['function_name']['value'],
+                    transform(name),
+                    [transform('value{0}'.format(i))
+                     for i in range(index % 5 + 1)],
+                    function_name)
+
+        pool = ThreadPool(8)
+        self.addCleanup(pool.close)
+        for (output, properties, function_name, expected_output,
+             expected_properties, expected_function_name) in \
+                pool.map(parse, range(60)):
+            self.assertEqual(expected_output, output)
+            self.assertEqual(sorted(expected_properties), properties)
+            self.assertEqual(expected_function_name, function_name)
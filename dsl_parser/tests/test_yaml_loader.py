@@ -0,0 +1,273 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import pickle
+
+import testtools
+from testtools.testcase import skipIf
+
+from dsl_parser import (holder,
+                        yaml_loader)
+
+
+YAML = """
+tosca_definitions_version: cloudify_dsl_1_1
+# a comment
+dsl_definitions:
+    anchor: &anchor
+        key: value
+        number: 1
+node_types:
+    type:
+        properties:
+            a: *anchor
+            b: { default: [1, 2.5, true, null, ~, 'quoted', "double"] }
+            c:
+                default: |
+                    multi
+                    line
+            d: >
+                folded
+                text
+            e: !!set { x, y }
+            f: !!omap [ a: 1, b: 2 ]
+            g: !!binary aGVsbG8=
+            h: 2015-01-01
+            i: 0x1f
+            j: -.inf
+sequence:
+    -   first
+    -   - nested
+        - sequence
+    -   key: value
+empty_map: {}
+empty_list: []
+"""
+
+
+def _tree(value_holder):
+    # a comparable representation of a holder tree, with its marks
+    if isinstance(value_holder, tuple):
+        # pairs of ordered maps
+        return tuple(_tree(item) for item in value_holder)
+    value = value_holder.value
+    if isinstance(value, dict):
+        value = sorted((_tree(key), _tree(item))
+                       for key, item in value.iteritems())
+    elif isinstance(value, (list, tuple)):
+        value = [_tree(item) for item in value]
+    elif isinstance(value, set):
+        value = sorted(_tree(item) for item in value)
+    return (value,
+            value_holder.start_line,
+            value_holder.start_column,
+            value_holder.end_line,
+            value_holder.end_column,
+            value_holder.filename)
+
+
+@skipIf(yaml_loader.CMarkedLoader is None, 'libyaml is not available')
+class TestCMarkedLoader(testtools.TestCase):
+
+    def _assert_same_trees(self, raw_yaml):
+        python_tree = yaml_loader.load(raw_yaml, 'file.yaml',
+                                       loader=yaml_loader.MarkedLoader)
+        c_tree = yaml_loader.load(raw_yaml, 'file.yaml',
+                                  loader=yaml_loader.CMarkedLoader)
+        self.assertIsInstance(c_tree, holder.Holder)
+        self.assertEqual(_tree(python_tree), _tree(c_tree))
+
+    def test_default_loader(self):
+        self.assertIs(yaml_loader.CMarkedLoader, yaml_loader.DefaultLoader)
+
+    def test_same_holder_trees(self):
+        self._assert_same_trees(YAML)
+
+    def test_same_holder_trees_for_scalars_and_empty_documents(self):
+        for raw_yaml in ['', 'value', '1', '[]', '{}', '- a\n- b\n']:
+            self._assert_same_trees(raw_yaml)
+
+
+class TestHolder(testtools.TestCase):
+
+    def test_slotted(self):
+        value_holder = holder.Holder('value', 1, 2, 3, 4, 'file.yaml')
+        self.assertFalse(hasattr(value_holder, '__dict__'))
+        self.assertRaises(AttributeError, setattr, value_holder, 'other', 1)
+
+    def test_marks(self):
+        value_holder = holder.Holder('value', 1, 0, 70000, 2 ** 31,
+                                     'file.yaml')
+        self.assertEqual((1, 0, 70000, 2 ** 31),
+                         (value_holder.start_line,
+                          value_holder.start_column,
+                          value_holder.end_line,
+                          value_holder.end_column))
+        value_holder.start_column = None
+        value_holder.end_line = 5
+        self.assertEqual((1, None, 5, 2 ** 31),
+                         (value_holder.start_line,
+                          value_holder.start_column,
+                          value_holder.end_line,
+                          value_holder.end_column))
+        self.assertIsNone(holder.Holder('value').start_line)
+
+    def test_copy_and_pickle(self):
+        value_holder = holder.Holder('value', 1, 2, 3, 4, 'file.yaml')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = pickle.loads(pickle.dumps(value_holder, protocol))
+            self.assertEqual(str(value_holder), str(loaded))
+        self.assertEqual(str(value_holder), str(value_holder.copy()))
+
+    def test_shared_filename(self):
+        filename = ''.join(['file', '.yaml'])
+        result = yaml_loader.load('a: [b, c]', filename)
+        (key, value), = result.value.items()
+        self.assertIs(result.filename, key.filename)
+        self.assertIs(key.filename, value.value[1].filename)
+
+
+class TestPositionTable(testtools.TestCase):
+
+    def test_same_holder_trees(self):
+        for loader in [yaml_loader.MarkedLoader, yaml_loader.DefaultLoader]:
+            expected = yaml_loader.load(YAML, 'file.yaml', loader=loader)
+            result = yaml_loader.load(YAML, 'file.yaml', loader=loader,
+                                      position_table=True)
+            self.assertEqual(_tree(expected), _tree(result))
+
+    def test_holders_share_table(self):
+        result = yaml_loader.load('a: [b, c]', 'file.yaml',
+                                  position_table=True)
+        table = result._source
+        self.assertIsInstance(table, holder.PositionTable)
+        self.assertEqual(5, len(table))
+        (key, value), = result.value.items()
+        self.assertIs(table, value.value[0]._source)
+
+    def test_set_marks_and_filename(self):
+        result = yaml_loader.load('a: b', 'file.yaml', position_table=True)
+        (key, value), = result.value.items()
+        value.end_column = 10
+        self.assertEqual(10, value.end_column)
+        value.filename = 'other.yaml'
+        self.assertEqual('other.yaml', value.filename)
+        self.assertEqual((0, 3, 0, 10),
+                         (value.start_line, value.start_column,
+                          value.end_line, value.end_column))
+        self.assertEqual('file.yaml', key.filename)
+
+
+class TestHolderKeyIndex(testtools.TestCase):
+
+    def test_get_item(self):
+        dict_holder = holder.Holder.of({'a': 1, 'b': 2})
+        key_holder, value_holder = dict_holder.get_item('b')
+        self.assertEqual(('b', 2), (key_holder.value, value_holder.value))
+        self.assertEqual((None, None), dict_holder.get_item('c'))
+        self.assertEqual((None, None), dict_holder.get_item([]))
+        self.assertIn('a', dict_holder)
+        self.assertNotIn('c', dict_holder)
+
+    def test_direct_additions_and_replaced_value(self):
+        dict_holder = holder.Holder.of({'a': 1})
+        self.assertNotIn('b', dict_holder)
+        dict_holder.value[holder.Holder('b')] = holder.Holder(2)
+        self.assertIn('b', dict_holder)
+        dict_holder.value = {holder.Holder('c'): holder.Holder(3)}
+        self.assertNotIn('a', dict_holder)
+        self.assertIn('c', dict_holder)
+
+    def test_replaced_value(self):
+        dict_holder = holder.Holder.of({'a': 1})
+        key_holder, _ = dict_holder.get_item('a')
+        dict_holder.value[key_holder] = holder.Holder(2)
+        self.assertEqual(2, dict_holder.get_item('a')[1].value)
+        dict_holder.value[holder.Holder('b')] = holder.Holder(3)
+        self.assertEqual(3, dict_holder.get_item('b')[1].value)
+        self.assertEqual({'a': 2, 'b': 3}, dict_holder.restore())
+
+    def test_deleted_and_added_keys(self):
+        dict_holder = yaml_loader.load('a: 1\nb: 2\n', 'file.yaml')
+        self.assertIsInstance(dict_holder.value, holder.HolderDict)
+        key_holder, _ = dict_holder.get_item('a')
+        del dict_holder.value[key_holder]
+        dict_holder.value[holder.Holder('c')] = holder.Holder(3)
+        self.assertNotIn('a', dict_holder)
+        self.assertEqual(3, dict_holder.get_item('c')[1].value)
+        dict_holder.value.pop(dict_holder.get_item('b')[0])
+        dict_holder.value.update({holder.Holder('d'): holder.Holder(4)})
+        self.assertNotIn('b', dict_holder)
+        self.assertEqual(4, dict_holder.get_item('d')[1].value)
+
+    def test_plain_dict_values(self):
+        dict_holder = holder.Holder({holder.Holder('a'): holder.Holder(1)})
+        self.assertIn('a', dict_holder)
+        key_holder, _ = dict_holder.get_item('a')
+        dict_holder.value[key_holder] = holder.Holder(2)
+        self.assertEqual(2, dict_holder.get_item('a')[1].value)
+
+    def test_pickle(self):
+        dict_holder = holder.Holder.of({'a': 1})
+        dict_holder.get_item('a')
+        loaded = pickle.loads(pickle.dumps(dict_holder))
+        self.assertIsInstance(loaded.value, holder.HolderDict)
+        self.assertEqual({'a': 1}, loaded.restore())
+        self.assertEqual(1, loaded.get_item('a')[1].value)
+
+    def test_unhashable_keys(self):
+        dict_holder = yaml_loader.load('? [a, b]\n: 1\nc: 2\n', 'file.yaml')
+        list_key_holder = [key for key in dict_holder.value
+                           if isinstance(key.value, list)][0]
+        self.assertEqual(
+            1, dict_holder.get_item(list_key_holder.value)[1].value)
+        self.assertEqual(2, dict_holder.get_item('c')[1].value)
+
+
+class TestHolderCache(testtools.TestCase):
+
+    def test_shared_trees(self):
+        cache = yaml_loader.HolderCache()
+        result = cache.load('a: b', 'file.yaml')
+        self.assertIs(result, cache.load('a: b', 'file.yaml'))
+        self.assertIsNot(result, cache.load('a: b', 'other.yaml'))
+        self.assertIsNot(result, cache.load('a: c', 'file.yaml'))
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+        self.assertEqual({'a': 'b'}, result.restore())
+        self.assertEqual(3, len(cache))
+
+    def test_loaders(self):
+        cache = yaml_loader.HolderCache()
+        result = cache.load('a: b', 'file.yaml',
+                            loader=yaml_loader.MarkedLoader)
+        self.assertIs(result, cache.load('a: b', 'file.yaml',
+                                         loader=yaml_loader.MarkedLoader))
+        self.assertIs(cache.load('a: b', 'file.yaml'),
+                      cache.load('a: b', 'file.yaml',
+                                 loader=yaml_loader.DefaultLoader))
+        if yaml_loader.CMarkedLoader is not None:
+            self.assertIsNot(result, cache.load('a: b', 'file.yaml'))
+
+    def test_max_yaml_bytes(self):
+        cache = yaml_loader.HolderCache(max_yaml_bytes=8)
+        first = cache.load('a: b', 'file1.yaml')
+        cache.load('a: b', 'file2.yaml')
+        self.assertEqual((2, 8), (len(cache), cache.yaml_bytes))
+        cache.load('a: b', 'file3.yaml')
+        self.assertEqual((2, 8), (len(cache), cache.yaml_bytes))
+        self.assertIsNot(first, cache.load('a: b', 'file1.yaml'))
+        cache.clear()
+        self.assertEqual((0, 0, 0, 0), (len(cache), cache.yaml_bytes,
+                                        cache.hits, cache.misses))
@@ -20,6 +20,7 @@ import yaml.parser
 
 from dsl_parser import yaml_loader
 from dsl_parser import functions
+from dsl_parser import cancellation
 from dsl_parser.exceptions import (DSLParsingLogicException,
                                    DSLParsingFormatException)
 
@@ -111,8 +112,10 @@ def _validate_properties_types(properties, properties_schema):
                 .format(prop_key, prop_type, prop_val))
 
 
-def load_yaml(raw_yaml, error_message, filename=None):
+def load_yaml(raw_yaml, error_message, filename=None, cache=None):
     try:
+        if cache is not None:
+            return cache.load(raw_yaml, filename)
         return yaml_loader.load(raw_yaml, filename)
     except yaml.parser.ParserError, ex:
         raise DSLParsingFormatException(-1, '{0}: Illegal yaml; {1}'
@@ -120,6 +123,7 @@ def load_yaml(raw_yaml, error_message, filename=None):
 
 
 def url_exists(url):
+    cancellation.check()
     try:
         with contextlib.closing(urllib2.urlopen(url)):
             return True
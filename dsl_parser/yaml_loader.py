@@ -13,21 +13,33 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import collections
+import hashlib
+import threading
+
 from yaml.reader import Reader
 from yaml.scanner import Scanner
 from yaml.composer import Composer
 from yaml.resolver import Resolver
 from yaml.parser import Parser
 from yaml.constructor import SafeConstructor
+try:
+    from yaml.cyaml import CParser
+except ImportError:
+    CParser = None
 
 from dsl_parser import holder
 
 
 class HolderConstructor(SafeConstructor):
 
-    def __init__(self, filename):
+    def __init__(self, filename, position_table=None):
         SafeConstructor.__init__(self)
+        if isinstance(filename, str):
+            # share one filename string between all loaded holders
+            filename = intern(filename)
         self.filename = filename
+        self.position_table = position_table
 
     def construct_yaml_null(self, node):
         obj = SafeConstructor.construct_yaml_null(self, node)
@@ -74,10 +86,16 @@ class HolderConstructor(SafeConstructor):
         return self._holder(obj, node)
 
     def construct_yaml_map(self, node):
-        obj, = SafeConstructor.construct_yaml_map(self, node)
+        obj = holder.HolderDict(self.construct_mapping(node))
         return self._holder(obj, node)
 
     def _holder(self, obj, node):
+        if self.position_table is not None:
+            return self.position_table.holder(obj,
+                                              node.start_mark.line,
+                                              node.start_mark.column,
+                                              node.end_mark.line,
+                                              node.end_mark.column)
         return holder.Holder(value=obj,
                              start_line=node.start_mark.line,
                              start_column=node.start_mark.column,
@@ -136,19 +154,98 @@ HolderConstructor.add_constructor(
 
 class MarkedLoader(Reader, Scanner, Parser, Composer, HolderConstructor,
                    Resolver):
-    def __init__(self, stream, filename=None):
+    def __init__(self, stream, filename=None, position_table=None):
         Reader.__init__(self, stream)
         Scanner.__init__(self)
         Parser.__init__(self)
         Composer.__init__(self)
-        HolderConstructor.__init__(self, filename)
+        HolderConstructor.__init__(self, filename, position_table)
         Resolver.__init__(self)
 
 
-def load(stream, filename):
-    result = MarkedLoader(stream, filename).get_single_data()
+if CParser is not None:
+    class CMarkedLoader(CParser, HolderConstructor, Resolver):
+        """MarkedLoader on top of the libyaml parser"""
+        def __init__(self, stream, filename=None, position_table=None):
+            CParser.__init__(self, stream)
+            HolderConstructor.__init__(self, filename, position_table)
+            Resolver.__init__(self)
+else:
+    CMarkedLoader = None
+
+
+# the libyaml based loader is used when PyYAML was built with it
+DefaultLoader = CMarkedLoader or MarkedLoader
+
+
+def load(stream, filename, loader=None, position_table=False):
+    """
+    Load ``stream`` into a holder tree. With ``position_table`` the source
+    positions of all holders are kept in a single
+    :class:`dsl_parser.holder.PositionTable` instead of in each holder.
+    """
+    loader = loader or DefaultLoader
+    table = holder.PositionTable(filename) if position_table else None
+    result = loader(stream, filename, table).get_single_data()
     if result is None:
         # load of empty string returns None so we convert it to an empty
         # dict
         result = holder.Holder.of({}, filename=filename)
     return result
+
+
+class HolderCache(object):
+    """
+    Least recently used cache of loaded holder trees, shared by parses.
+
+    Trees are kept under the sha1 of the raw yaml, the filename and the
+    loader, so files imported by many blueprints are only loaded once.
+    Cached trees are shared as is and must be treated as read only.
+
+    The cache is bounded by the raw yaml its trees were loaded from, at
+    most ``max_yaml_bytes`` in total (``yaml_bytes``). The trees take
+    several times as much memory as their raw yaml.
+    """
+
+    def __init__(self, max_yaml_bytes=32 * 1024 * 1024):
+        self.max_yaml_bytes = max_yaml_bytes
+        self.yaml_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, raw_yaml, filename, loader=None):
+        loader = loader or DefaultLoader
+        data = raw_yaml
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        key = (hashlib.sha1(data).hexdigest(), filename, loader)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        result = load(raw_yaml, filename, loader=loader)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.yaml_bytes -= previous[1]
+            self._entries[key] = (result, len(data))
+            self.yaml_bytes += len(data)
+            while self.yaml_bytes > self.max_yaml_bytes and self._entries:
+                _, (_, size) = self._entries.popitem(last=False)
+                self.yaml_bytes -= size
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.yaml_bytes = 0
+            self.hits = 0
+            self.misses = 0